@@ -0,0 +1,355 @@
+"""
+    Columnar representation of multiple sequence alignments,
+    such as the families of Stockholm files.
+"""
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .parentheses import Parentheses
+
+__all__ = ["Alignment"]
+
+
+class Alignment(object):
+    """
+    Multiple sequence alignment stored as a 2-D uint8 array of shape
+    (n_sequences, n_columns), holding the ASCII code of every character,
+    along with an array of the names of the sequences.
+
+    Column operations (gap masks, composition counts) are vectorized
+    over the whole array, and selecting a range of columns returns an
+    Alignment sharing the memory of the original one :
+
+    >>> alignment = Alignment.from_rows(names, rows)
+    >>> alignment.gap_mask().mean(axis=0)      # fraction of gaps per column
+    >>> alignment.columns(12, 18).composition()
+    >>> sequence, columns = alignment.degap(0)
+    >>> structures = alignment.project_parentheses(family.ss_cons)
+
+    Any of the characters of Alignment.gaps is a gap.
+    """
+
+    # Upper bound on the number of temporary cells allocated
+    # when counting the pairs of states of a block of columns.
+    _block_cells: int = 1 << 22
+
+    gaps: str = "-._~"
+
+    alphabet: str = "ACGU"
+
+    # code of each byte for the composition counts : A, C, G, U (or T), gap,
+    # anything else, regardless of the case
+    __codes: np.ndarray = np.full(256, 5, dtype=np.uint8)
+    __codes[np.frombuffer(b"ACGUTacgut", dtype=np.uint8)] = [0, 1, 2, 3, 3] * 2
+    __codes[np.frombuffer(gaps.encode("ascii"), dtype=np.uint8)] = 4
+
+    def __init__(self, names: Iterable[str], data: np.ndarray):
+        data = np.asarray(data)
+        if data.ndim != 2 or data.dtype != np.uint8:
+            raise TypeError(f"data should be a 2-D uint8 array, not {data.dtype}")
+        if not isinstance(names, np.ndarray):
+            names = list(names)
+        self._names: np.ndarray = np.asarray(names, dtype=str)
+        if len(self._names) != data.shape[0]:
+            raise ValueError(
+                f"{len(self._names)} names given for {data.shape[0]} sequences"
+            )
+        self._data: np.ndarray = data
+
+    @classmethod
+    def from_rows(cls, names: Iterable[str], rows: Iterable[str]) -> "Alignment":
+        """ Build an Alignment from aligned rows of equal length."""
+        names, rows = list(names), [row.encode("ascii") for row in rows]
+        width = len(rows[0]) if rows else 0
+        if any(len(row) != width for row in rows):
+            raise ValueError("All the rows of an alignment must have the same length")
+        data = np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(len(rows), width)
+        return cls(names, data.copy())
+
+    def __repr__(self):
+        return f"Alignment(n_sequences={self.n_sequences}, n_columns={self.n_columns})"
+
+    def __len__(self):
+        return self._data.shape[0]
+
+    def __getitem__(self, index: int) -> str:
+        """ The aligned row of a sequence, as a string."""
+        return self._data[index].tobytes().decode("ascii")
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        """ Iterate over the (name, aligned row) pairs."""
+        # decoding the whole array at once is much faster than row by row
+        text, width = self._data.tobytes().decode("ascii"), self.n_columns
+        for index, name in enumerate(self._names.tolist()):
+            yield name, text[index * width : (index + 1) * width]
+
+    @property
+    def names(self) -> np.ndarray:
+        return self._names
+
+    @property
+    def data(self) -> np.ndarray:
+        """ Read-only view on the (n_sequences, n_columns) uint8 array."""
+        view = self._data.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self._data.shape
+
+    @property
+    def n_sequences(self) -> int:
+        return self._data.shape[0]
+
+    @property
+    def n_columns(self) -> int:
+        return self._data.shape[1]
+
+    def index(self, name: str) -> int:
+        """ Row of the sequence called `name`."""
+        (rows,) = np.nonzero(self._names == name)
+        if not len(rows):
+            raise KeyError(f"No sequence {name!r} in the alignment")
+        return int(rows[0])
+
+    def columns(
+        self,
+        start: Optional[int] = None,
+        stop: Optional[int] = None,
+        step: Optional[int] = None,
+    ) -> "Alignment":
+        """Alignment of the columns [start:stop:step], sharing the memory
+        of self (no copy is made)."""
+        return Alignment(self._names, self._data[:, start:stop:step])
+
+    def rows(self, selection: Union[slice, np.ndarray, List[int]]) -> "Alignment":
+        """Alignment of a subset of the sequences, given as a slice (a view),
+        an array of indices or a boolean mask (a copy)."""
+        return Alignment(self._names[selection], self._data[selection])
+
+    def codes(self) -> np.ndarray:
+        """Array of the same shape as self.data, where A, C, G, U (or T) are
+        encoded as 0, 1, 2, 3, gaps as 4 and any other character as 5."""
+        return self.__codes[self._data]
+
+    def gap_mask(self) -> np.ndarray:
+        """ Boolean array, True where the alignment holds a gap."""
+        return self.codes() == 4
+
+    def composition(self) -> np.ndarray:
+        """Count the characters of each column, as an integer array of shape
+        (n_columns, 6) : the columns of the result count A, C, G, U (or T),
+        gaps and any other character, regardless of the case."""
+        # a single bincount, over the codes offset by 6 times their column
+        codes = self.codes() + np.arange(0, 6 * self.n_columns, 6, dtype=np.intp)
+        counts = np.bincount(codes.ravel(), minlength=6 * self.n_columns)
+        return counts.reshape(self.n_columns, 6)
+
+    def degap(self, index: int) -> Tuple[str, np.ndarray]:
+        """Return the ungapped sequence of a row, along with the alignment
+        column of each of its residues."""
+        (columns,) = np.nonzero(self.__codes[self._data[index]] != 4)
+        residues = self._data[index, columns].tobytes().decode("ascii")
+        return residues, columns
+
+    def column_maps(self) -> np.ndarray:
+        """Index maps from the alignment to every ungapped sequence, as an
+        integer array of the shape of self.data : entry (i, c) is the position
+        of column c in the ungapped sequence i, or -1 for a gap."""
+        residues = ~self.gap_mask()
+        maps = np.cumsum(residues, axis=1) - 1
+        maps[~residues] = -1
+        return maps
+
+    def __split_rows(self, values: np.ndarray, keep: np.ndarray) -> List[np.ndarray]:
+        """Private method, do not call.
+        Split the entries of `values` where `keep` is True, row by row."""
+        offsets = np.cumsum(keep.sum(axis=1))[:-1]
+        return np.split(values[keep], offsets)
+
+    def __join_rows(self, chars: np.ndarray, keep: np.ndarray) -> List[str]:
+        """Private method, do not call.
+        Join the characters of `chars` where `keep` is True, row by row."""
+        blob = chars[keep].tobytes().decode("ascii")
+        offsets = np.concatenate([[0], np.cumsum(keep.sum(axis=1))])
+        return [blob[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+
+    def degapped(self) -> List[str]:
+        """ The ungapped sequence of every row."""
+        return self.__join_rows(self._data, ~self.gap_mask())
+
+    def __projection(
+        self, structure: Union[str, np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Private method, do not call.
+        Project a consensus structure on every row : return the mask of the
+        residues and, for every cell, the position in the ungapped row of the
+        residue it is paired with, or -1. A consensus pair is dropped from the
+        rows where any of its two columns is a gap."""
+        if isinstance(structure, str):
+            structure = Parentheses.pair_table(structure)
+        structure = np.asarray(structure)
+        if structure.shape != (self.n_columns,):
+            raise ValueError(
+                f"The structure describes {len(structure)} columns, "
+                f"the alignment has {self.n_columns}"
+            )
+        maps = self.column_maps()
+        residues = maps >= 0
+        paired = structure >= 0
+        partners = np.where(paired, structure, 0)
+        kept = residues & paired & residues[:, partners]
+        return residues, np.where(kept, maps[:, partners], -1)
+
+    def project_pairs(self, structure: Union[str, np.ndarray]) -> List[np.ndarray]:
+        """Project a consensus structure, given as a bracket expression (e.g.
+        the WUSS #=GC SS_cons line) or as a pair table over the columns, on
+        every sequence of the alignment at once. Return the pair table of every
+        ungapped sequence (see Parentheses.pair_table()) : consensus pairs
+        with a gap on either side are dropped, the other ones are remapped to
+        the positions of the ungapped sequence."""
+        residues, partners = self.__projection(structure)
+        return self.__split_rows(partners, residues)
+
+    def project_parentheses(self, structure: Union[str, np.ndarray]) -> List[str]:
+        """Like self.project_pairs(), but return the structure of every ungapped
+        sequence as a parenthesised expression using "(", "-", ")", as expected
+        by Tree.from_parentheses_and_sequence() along with self.degapped()."""
+        residues, partners = self.__projection(structure)
+        positions = np.cumsum(residues, axis=1) - 1
+        chars = np.full(partners.shape, ord("-"), dtype=np.uint8)
+        chars[(partners >= 0) & (partners > positions)] = ord("(")
+        chars[(partners >= 0) & (partners < positions)] = ord(")")
+        return self.__join_rows(chars, residues)
+
+    def one_hot(self, gaps: bool = False) -> np.ndarray:
+        """One-hot encoding of the alignment, as a float32 array of shape
+        (n_sequences, n_columns, 4) over A, C, G, U, with a fifth state for
+        gaps if `gaps` is True. Other characters (and gaps otherwise) are
+        encoded as all zeros."""
+        states = np.arange(5 if gaps else 4, dtype=np.uint8)
+        return (self.codes()[:, :, np.newaxis] == states).astype(np.float32)
+
+    def _pair_counts(
+        self, one_hot: np.ndarray, max_span: Optional[int] = None
+    ) -> Iterator[Tuple[int, int, np.ndarray]]:
+        """
+        Private method, do not call.
+        Joint counts of the states of every pair of columns, computed as the
+        product of the one-hot encoding (see self.one_hot()) with itself, by
+        blocks of rows of at most self._block_cells cells. Yield tuples
+        (start, stop, counts) where counts[i - start, j, a, b] is the number of
+        sequences holding state a in column i and state b in column j.
+
+        With `max_span`, only the pairs of columns (i, i + k), 0 <= k <=
+        max_span, are counted, in O(n_columns * max_span) : counts has then
+        the band layout of TriangularMatrix, counts[i - start, k] holding the
+        counts of columns (i, i + k), zero past the last column.
+        """
+        n, L, S = one_hot.shape
+        if max_span is None:
+            flat = one_hot.reshape(n, L * S)
+            rows = max(1, self._block_cells // max(1, L * S * S))
+            for start in range(0, L, rows):
+                stop = min(L, start + rows)
+                counts = flat[:, start * S : stop * S].T @ flat
+                counts = counts.reshape(stop - start, S, L, S)
+                yield start, stop, counts.transpose(0, 2, 1, 3)
+            return
+
+        width = max_span + 1
+        # columns past the last one are padded with zeros
+        padded = np.zeros((n, L + width, S), dtype=one_hot.dtype)
+        padded[:, :L] = one_hot
+        flat = padded.reshape(n, (L + width) * S)
+        # blocks of at most `width` rows, so that at most half of each product
+        # falls outside of the band
+        rows = max(1, min(self._block_cells // (width * S * S), width))
+        for start in range(0, L, rows):
+            stop = min(L, start + rows)
+            block = stop - start
+            counts = flat[:, start * S : stop * S].T @ flat[
+                :, start * S : (stop + width - 1) * S
+            ]
+            counts = counts.reshape(block, S, block + width - 1, S)
+            offsets = np.arange(block)[:, None] + np.arange(width)
+            band = counts.transpose(0, 2, 1, 3)[np.arange(block)[:, None], offsets]
+            yield start, stop, band
+
+    @staticmethod
+    def _mutual_information(counts: np.ndarray) -> np.ndarray:
+        """
+        Private method, do not call.
+        Mutual information (in bits) of the joint counts held in the last two
+        axes of `counts`, the frequencies being normalised by the number of
+        sequences counted for each pair of columns.
+        """
+        counts = counts.astype(np.float64)
+        total = counts.sum(axis=(-2, -1), keepdims=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            joint = counts / total
+            left = joint.sum(axis=-1, keepdims=True)
+            right = joint.sum(axis=-2, keepdims=True)
+            # empty cells give 0 * log(0) = nan, i.e. no contribution
+            return np.nansum(joint * np.log2(joint / (left * right)), axis=(-2, -1))
+
+    def mutual_information(
+        self,
+        apc: bool = False,
+        structure: Optional[Union[str, np.ndarray]] = None,
+        gaps: bool = False,
+    ) -> np.ndarray:
+        """
+        Mutual information between the columns of the alignment, as a
+        symmetric (n_columns, n_columns) float array in bits, with zeros on
+        the diagonal. For each pair of columns, only the sequences holding a
+        base in both columns are counted, unless `gaps` is True, in which
+        case gaps are a fifth state.
+
+        The joint counts of all the pairs of states are computed as products
+        of the one-hot encoding with itself, a block of columns at a time so
+        that at most self._block_cells counts are held in memory.
+
+        If `apc` is True, the average product correction is applied :
+            MI[i, j] - mean(MI[i, :]) * mean(MI[:, j]) / mean(MI)
+        with the means taken off the diagonal.
+
+        If `structure` is given (a bracket expression such as the WUSS
+        SS_cons line, or a pair table), only the pairs of columns it marks
+        as paired are computed, the other entries being zero. The average
+        product correction needs every pair and is not available then.
+        """
+        one_hot = self.one_hot(gaps)
+        n, L, S = one_hot.shape
+        mi = np.zeros((L, L), dtype=np.float64)
+
+        if structure is not None:
+            if apc:
+                raise ValueError("apc requires the mutual information of all columns")
+            if isinstance(structure, str):
+                structure = Parentheses.pair_table(structure)
+            structure = np.asarray(structure)
+            if structure.shape != (L,):
+                raise ValueError(
+                    f"The structure describes {len(structure)} columns, "
+                    f"the alignment has {L}"
+                )
+            left = np.flatnonzero(structure > np.arange(L))
+            right = structure[left]
+            counts = np.einsum("nia,nib->iab", one_hot[:, left], one_hot[:, right])
+            mi[left, right] = mi[right, left] = self._mutual_information(counts)
+            return mi
+
+        for start, stop, counts in self._pair_counts(one_hot):
+            mi[start:stop] = self._mutual_information(counts)
+        np.fill_diagonal(mi, 0)
+
+        if apc and L > 2:
+            means = mi.sum(axis=1) / (L - 1)
+            overall = mi.sum() / (L * (L - 1))
+            if overall > 0:
+                mi -= np.outer(means, means) / overall
+                np.fill_diagonal(mi, 0)
+        return mi
@@ -0,0 +1,149 @@
+"""
+    Fold many sequences at once, spreading the RNAStruct
+    folds over a pool of worker processes.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+import numpy as np
+
+from .dynamicprog import RNAStruct
+from .scoring import ScoringModel
+from .sequence import Sequence
+
+__all__ = ["FoldResult", "fold_many"]
+
+# dtype of the pair tables written to shared memory
+_pair_dtype: np.dtype = np.dtype(np.int32)
+
+
+class FoldResult(NamedTuple):
+    """Result of one fold of fold_many() : `index` is the position of the
+    sequence in the input, `pairs` the pair table of an optimal structure
+    (see RNAStruct.pair_table())."""
+
+    index: int
+    max_n_pairs: Union[int, float]
+    pairs: np.ndarray
+
+
+def _fold_into(
+    name: str,
+    offset: int,
+    sequence: str,
+    max_span: Optional[int],
+    scoring: Optional[ScoringModel],
+    backend: str,
+) -> Union[int, float]:
+    """
+    Private function, do not call.
+    Fold a sequence in a worker process, write its pair table to the shared
+    memory block `name`, starting at element `offset`, and return its score.
+    """
+    fold = RNAStruct(sequence, max_span, scoring, backend)
+    block = SharedMemory(name=name)
+    try:
+        table = np.ndarray(
+            (len(sequence),),
+            dtype=_pair_dtype,
+            buffer=block.buf,
+            offset=offset * _pair_dtype.itemsize,
+        )
+        table[:] = fold.pair_table()
+        del table
+    finally:
+        block.close()
+    return fold.max_n_pairs.item()
+
+
+def fold_many(
+    sequences: Iterable[str],
+    workers: Optional[int] = None,
+    max_span: Optional[int] = None,
+    scoring: Optional[ScoringModel] = None,
+    backend: str = "dense",
+) -> Iterator[FoldResult]:
+    """Fold every sequence with RNAStruct(sequence, max_span, scoring, backend)
+    using `workers` processes (os.cpu_count() by default), and yield a
+    FoldResult per sequence, in completion order.
+
+    Sequences are submitted longest-first, so that the long folds do not end
+    up alone at the end of the run. The workers never send back their
+    matrices : each one writes its pair table into a shared memory block,
+    at an offset given by the lengths of the preceding sequences, and only
+    returns the score.
+
+    With workers=1 the sequences are folded in the calling process.
+
+    Usage :
+
+    >>> for result in fold_many(sequences, workers=8, max_span=150):
+    ...     structures[result.index] = result.pairs
+    """
+    sequences = [str(sequence) for sequence in sequences]
+    workers = workers or os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"workers should be a positive integer, not {workers}")
+    # validate the arguments now, rather than on the first next()
+    RNAStruct("", max_span, scoring, backend)
+    for index, sequence in enumerate(sequences):
+        if not Sequence.is_valid_sequence(sequence):
+            raise ValueError(f"Sequence {index} contains invalid characters")
+    return _fold_many(sequences, workers, max_span, scoring, backend)
+
+
+def _fold_many(
+    sequences: List[str],
+    workers: int,
+    max_span: Optional[int],
+    scoring: Optional[ScoringModel],
+    backend: str,
+) -> Iterator[FoldResult]:
+    """
+    Private function, do not call.
+    Generator of fold_many(), called once its arguments are validated.
+    """
+    order = sorted(range(len(sequences)), key=lambda i: -len(sequences[i]))
+
+    if workers == 1:
+        for index in order:
+            fold = RNAStruct(sequences[index], max_span, scoring, backend)
+            yield FoldResult(index, fold.max_n_pairs.item(), fold.pair_table())
+        return
+
+    offsets = np.concatenate([[0], np.cumsum([len(s) for s in sequences])])
+    size = max(int(offsets[-1]), 1) * _pair_dtype.itemsize
+    block = SharedMemory(create=True, size=size)
+    tables = np.ndarray((int(offsets[-1]),), dtype=_pair_dtype, buffer=block.buf)
+    executor = ProcessPoolExecutor(max_workers=min(workers, max(len(sequences), 1)))
+    pending: Dict[Future, int] = {}
+    try:
+        pending = {
+            executor.submit(
+                _fold_into,
+                block.name,
+                int(offsets[index]),
+                sequences[index],
+                max_span,
+                scoring,
+                backend,
+            ): index
+            for index in order
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                pairs = tables[offsets[index] : offsets[index + 1]].astype(int)
+                yield FoldResult(index, future.result(), pairs)
+    finally:
+        # cancel the folds not started yet (shutdown(cancel_futures=True)
+        # requires Python 3.9)
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        del tables
+        block.close()
+        block.unlink()
@@ -0,0 +1,145 @@
+"""
+    Content-addressed cache of RNA folds, so that sequences folded
+    again (with the same parameters) are not folded twice.
+"""
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from .scoring import ScoringModel
+
+__all__ = ["FoldCache"]
+
+# cached result of a fold : its score and the pair table of an optimal structure
+Entry = Tuple[Union[int, float], np.ndarray]
+
+
+class FoldCache(object):
+    """
+    Two-tier cache of fold results, keyed by a hash of the sequence
+    and of the folding parameters (max_span and ScoringModel.key).
+
+    Parameters :
+        maxsize   : number of results kept in memory, the least recently
+                    used ones being evicted first.
+        directory : optional directory of the on-disk tier, where every
+                    result is also stored as a fold-<key>.npz file, shared by
+                    the processes and runs using the same directory.
+
+    The cache is used by RNAStruct when given as its `cache` argument :
+
+    >>> cache = FoldCache(maxsize=4096, directory="~/.cache/arnstruct")
+    >>> RNAStruct(sequence, cache=cache).max_n_pairs   # folds the sequence
+    >>> RNAStruct(sequence, cache=cache).max_n_pairs   # read from the cache
+
+    Hits and misses are counted in self.stats.
+    """
+
+    # bump when the layout of the cached results changes
+    _version: int = 1
+
+    def __init__(self, maxsize: int = 1024, directory: Optional[str] = None):
+        if maxsize < 0:
+            raise ValueError(f"maxsize should be non-negative, not {maxsize}")
+        self._maxsize: int = maxsize
+        self._memory: "OrderedDict[str, Entry]" = OrderedDict()
+        self._directory: Optional[str] = None
+        if directory is not None:
+            self._directory = os.path.abspath(os.path.expanduser(directory))
+            os.makedirs(self._directory, exist_ok=True)
+        self._stats: Dict[str, int] = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    def __repr__(self):
+        return (
+            f"FoldCache(maxsize={self._maxsize}, directory={self._directory!r}, "
+            f"stats={self._stats})"
+        )
+
+    def __len__(self):
+        """ Number of results held in memory."""
+        return len(self._memory)
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    @property
+    def directory(self) -> Optional[str]:
+        return self._directory
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Copy of the counters : `hits` (found in memory), `disk_hits`
+        (found on disk only) and `misses`."""
+        return self._stats.copy()
+
+    @classmethod
+    def key(cls, sequence: str, max_span: int, scoring: ScoringModel) -> str:
+        """Hexadecimal SHA-256 digest identifying the fold of `sequence`
+        with the given parameters. max_span is the effective one, i.e.
+        RNAStruct.max_span, so that equivalent folds share their key."""
+        description = repr((cls._version, sequence.upper(), max_span, scoring.key))
+        return hashlib.sha256(description.encode("ascii")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        """ Private method, do not call. File of a key in the on-disk tier."""
+        return os.path.join(self._directory, f"fold-{key}.npz")
+
+    def _remember(self, key: str, entry: Entry):
+        """ Private method, do not call. Insert an entry in the memory tier."""
+        if not self._maxsize:
+            return
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._maxsize:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Entry]:
+        """Return the (score, pair table) stored under `key`, or None.
+        The returned pair table must not be modified."""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self._stats["hits"] += 1
+            return self._memory[key]
+
+        if self._directory is not None and os.path.exists(self._path(key)):
+            with np.load(self._path(key)) as stored:
+                entry = (stored["score"][()], stored["pairs"])
+            self._remember(key, entry)
+            self._stats["disk_hits"] += 1
+            return entry
+
+        self._stats["misses"] += 1
+        return None
+
+    def put(self, key: str, score: Union[int, float], pairs: np.ndarray):
+        """ Store the result of a fold in both tiers."""
+        pairs = np.array(pairs, dtype=np.int32)
+        pairs.flags.writeable = False
+        self._remember(key, (score, pairs))
+        if self._directory is None:
+            return
+
+        # write to a temporary file first, so that readers never see partial files
+        descriptor, temporary = tempfile.mkstemp(suffix=".npz", dir=self._directory)
+        try:
+            with os.fdopen(descriptor, "wb") as stream:
+                np.savez(stream, score=np.asarray(score), pairs=pairs)
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def clear(self, disk: bool = False):
+        """Empty the memory tier and reset the counters, and also delete
+        the files of the on-disk tier if `disk` is True."""
+        self._memory.clear()
+        self._stats = dict.fromkeys(self._stats, 0)
+        if disk and self._directory is not None:
+            for name in os.listdir(self._directory):
+                if name.startswith("fold-") and name.endswith(".npz"):
+                    os.unlink(os.path.join(self._directory, name))
@@ -0,0 +1,145 @@
+"""
+    Consensus secondary structure of a whole alignment,
+    folded once over its columns (alifold-style).
+"""
+from typing import Optional
+
+import numpy as np
+
+from .alignment import Alignment
+from .dynamicprog import RNAStruct
+from .scoring import ScoringModel
+from .triangular import TriangularMatrix
+
+__all__ = ["ConsensusFold"]
+
+
+class ConsensusFold(RNAStruct):
+    """
+    Fold an Alignment into a single consensus secondary structure over its
+    columns, in the spirit of RNAalifold : the score of a pair of columns
+    (i, j) is summed over the N aligned sequences, plus a covariation bonus
+    rewarding compensatory mutations :
+
+        score(i, j) = sum_n w(a_n, b_n)
+                      + covariation * N * C(i, j)
+                      - penalty * (number of sequences unable to pair)
+
+    where (a_n, b_n) are the bases of sequence n in columns i and j, w the
+    weight of the pair in the ScoringModel, and C(i, j) the covariation
+    term of RNAalifold : over the pairs of sequences both forming an
+    allowed pair, the average number of bases that differ (1 for a
+    consistent mutation, 2 for a compensatory one), i.e.
+
+        C(i, j) = 1/2 sum_{ab, cd allowed} f(ab) f(cd) d(ab, cd)
+
+    with f the frequencies of the pairs of bases in columns (i, j).
+    Negative scores are clipped to zero : such pairs are never formed.
+
+    Pair scores are computed once per pair of columns, from the joint counts
+    of the one-hot encoded alignment (see Alignment._pair_counts()), and the
+    fold then proceeds as in RNAStruct, on the consensus sequence (the most
+    frequent base of each column). Structures are thus expressed in
+    alignment columns, and max_n_pairs is the consensus score.
+
+    >>> fold = ConsensusFold(family.alignment, max_span=150)
+    >>> fold.to_parentheses()
+    """
+
+    def __init__(
+        self,
+        alignment: Alignment,
+        max_span: Optional[int] = None,
+        scoring: Optional[ScoringModel] = None,
+        backend: str = "dense",
+        covariation: float = 1.0,
+        penalty: float = 1.0,
+    ):
+        if not isinstance(alignment, Alignment):
+            raise TypeError(f"alignment should be an Alignment, not {type(alignment)}")
+        if backend == "four_russians":
+            raise ValueError("The four_russians backend requires unit pair scores")
+        self._alignment: Alignment = alignment
+        self._covariation: float = covariation
+        self._penalty: float = penalty
+        super().__init__(self.consensus_sequence(alignment), max_span, scoring, backend)
+
+    @staticmethod
+    def consensus_sequence(alignment: Alignment) -> str:
+        """Most frequent base of every column of an alignment (ties go to the
+        first one of A, C, G, U, as do columns holding gaps only)."""
+        bases = np.array(list(ScoringModel.alphabet))
+        composition = alignment.composition()[:, : len(bases)]
+        return "".join(bases[composition.argmax(axis=1)])
+
+    @property
+    def alignment(self) -> Alignment:
+        return self._alignment
+
+    def _column_scores(self, max_span: int) -> np.ndarray:
+        """
+        Private method, do not call.
+        Scores of the pairs of columns (i, i + k), 0 <= k <= max_span, as
+        defined in the docstring of the class, before clipping, as an
+        (n_columns, max_span + 1) array with the band layout of
+        TriangularMatrix : O(n_columns * max_span) pairs are counted.
+        """
+        table = self._scoring.table[:4, :4].astype(np.float64)
+        allowed = table > 0
+        a, b, c, d = np.ix_(*[np.arange(4)] * 4)
+        # number of differing bases between the allowed pairs (a, b) and (c, d)
+        distance = (a != c).astype(np.float64) + (b != d)
+        distance *= allowed[:, :, None, None] & allowed[None, None, :, :]
+
+        n = max(self._alignment.n_sequences, 1)
+        scores = np.zeros((self._n, max_span + 1), dtype=np.float64)
+        one_hot = self._alignment.one_hot()
+        for start, stop, counts in self._alignment._pair_counts(one_hot, max_span):
+            counts = counts.astype(np.float64)
+            paired = (counts * table).sum(axis=(-2, -1))
+            able = (counts * allowed).sum(axis=(-2, -1))
+            covariation = np.einsum(
+                "...ab,abcd,...cd->...", counts, distance, counts, optimize=True
+            ) / (2 * n)
+            scores[start:stop] = (
+                paired + self._covariation * covariation - self._penalty * (n - able)
+            )
+        return scores
+
+    def _pair_scores(self, max_span: Optional[int]) -> TriangularMatrix:
+        """
+        Private method, do not call.
+        Band of the clipped scores of the pairs of columns.
+        """
+        scores = TriangularMatrix(self._n, dtype=np.float64, max_span=max_span)
+        if not self._n:
+            return scores
+        width = scores.band.shape[1]
+        band = self._column_scores(width - 1)
+        inside = np.arange(self._n)[:, None] + np.arange(width) < self._n
+        scores.band[:] = np.where(inside, np.maximum(band, 0), 0)
+        scores.band[:, : self._scoring.min_loop + 1] = 0
+        return scores
+
+    def _window(self, start: int, stop: int) -> "ConsensusFold":
+        """ Private method, do not call. Consensus fold of columns [start:stop]."""
+        return ConsensusFold(
+            self._alignment.columns(start, stop),
+            self.max_span or None,
+            self._scoring,
+            self._backend,
+            self._covariation,
+            self._penalty,
+        )
+
+    def _score_dtype(self) -> np.dtype:
+        """ Private method, do not call. Consensus scores are real numbers."""
+        return np.dtype(np.float64)
+
+    def mutate(self, position: int, base: str):
+        """ Not available : a consensus fold has no sequence to mutate."""
+        raise NotImplementedError("A consensus fold has no sequence to mutate")
+
+    def mutation_scan(self):
+        """ Not available : a consensus fold has no sequence to mutate."""
+        raise NotImplementedError("A consensus fold has no sequence to mutate")
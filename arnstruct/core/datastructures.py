@@ -15,11 +15,16 @@
     Type,
     Tuple,
     Iterable,
+    Iterator,
+    Deque,
 )
 
-import copy
+from collections import deque
+from itertools import zip_longest
 
-__all__ = ["Queue", "Stack", "Node", "Tree"]
+import numpy as np
+
+__all__ = ["Queue", "Stack", "Node", "Tree", "NodeView", "ArrayTree"]
 
 
 class Queue(object):
@@ -36,6 +41,8 @@ class Queue(object):
 
     def __init__(self):
         self._items: List[Any] = []
+        # nodes holding the queue, told when it changes (see Node._changed())
+        self._owners: List["Node"] = []
 
     def __repr__(self):
         return f"Queue : {self._items}-> head"
@@ -70,6 +77,8 @@ def enqueue(self, *args) -> NoReturn:
         """ Add one (or more) elements to the queue."""
         for item in args:
             self._items.insert(0, item)
+        for owner in self._owners:
+            owner._changed()
 
     def dequeue(self) -> Any:
         """Remove the next element in the queue if possible (the queue is not empty).
@@ -77,7 +86,10 @@ def dequeue(self) -> Any:
         if self.is_empty():
             raise IndexError("cannot dequeue from empty Queue")
         else:
-            return self._items.pop()
+            item = self._items.pop()
+            for owner in self._owners:
+                owner._changed()
+            return item
 
     def empty(self) -> NoReturn:
         """ Empty the queue without returning the results. """
@@ -194,35 +206,17 @@ def __type_error(x: Any) -> str:
             ]
         )
 
-    @staticmethod
-    def _maximum_common_subtree(reference: "Node", other: "Node") -> "Node":
-        """ """
-        if not (isinstance(other, Node) and isinstance(reference, Node)):
-            raise TypeError(
-                "Cannot calculate a maximum common subtree on objects whose type is not Node"
-            )
-
-        max_subtree: "Node" = Node()
-        current_subtree: "Node" = Node()
-
-        if reference == other:
-            max_subtree = reference
-
-        if reference.children:
-            for child in reference.children:
-                if not other.is_leaf():
-                    for brether in other.children:
-                        current_subtree = Node._maximum_common_subtree(child, brether)
-                    if len(max_subtree) < len(current_subtree):
-                        max_subtree = current_subtree
-
-        return copy.deepcopy(max_subtree)
-
     def __init__(self, content: Optional[Any] = None):
         self.__uuid = hex(id(self))
         self._content: Any = content
         self._first_child: Union[Node, None] = None
         self._siblings: List[Node] = []
+        # nodes having this one as a child : a node may be shared by trees
+        self._parents: List[Node] = []
+        # values derived from the subtree rooted at the node, see _grow()
+        self._cache: Dict[str, Any] = {}
+        if isinstance(content, Queue):
+            content._owners.append(self)
 
     def __repr__(self):
         return f"Node({self.content})"
@@ -238,37 +232,23 @@ def __eq__(self, other: "Node"):
         return self.equals(other)
 
     def equals(self, other: "Node"):
-        """ """
+        """Do the subtrees rooted at both nodes have the same shape ?
+        (regardless of their contents) Two ordered trees have the same shape
+        if and only if the degrees of their nodes, in preorder, are equal."""
         if not isinstance(other, Node):
             raise TypeError(
                 f"Cannot compare instance of Node to instance of {type(other)}"
             )
-        if self.children and other.children:
-            for child, brether in zip(self.children, other.children):
-                if self.degree == other.degree and child.equals(brether):
-                    return True
-                else:
-                    return False
-        elif self.is_leaf() and other.is_leaf():
-            return True
-        else:
-            return False
-
-    def __count_depth_first_transversal(self, node: Optional["Node"] = None) -> int:
-        """Perform a depth-first transversal to count the number of nodes in the tree."""
-
-        node: Node = node or self
-
-        if not node.is_leaf():
-            return 1 + sum(
-                self.__count_depth_first_transversal(child) for child in node.children
-            )
-        else:
-            return 1
+        degrees = zip_longest(
+            (node.degree for node in self.preorder()),
+            (node.degree for node in other.preorder()),
+        )
+        return all(mine == theirs for mine, theirs in degrees)
 
     def __len__(self):
-        """ Wrapper for Node._Node__count_depth_first_transversal() """
-        return self.__count_depth_first_transversal()
+        """Number of nodes in the subtree rooted at the node, computed once
+        then kept up to date by add_child() and add_sibling()."""
+        return self._measure()["size"]
 
     @property
     def id(self) -> str:
@@ -295,19 +275,25 @@ def first_child(self) -> Union[None, "Node"]:
     def children(self) -> Union[None, List["Node"]]:
         """Return a list of the first child and all of its siblings,
         which together represent all the children of the node."""
-        if self.first_child is not None:
-            return [self.first_child] + self.first_child.siblings
+        if self._first_child is not None:
+            return [self._first_child, *self._first_child._siblings]
         else:
             return None
 
     @property
     def degree(self) -> int:
-        """ Return the number of children of the node """
-        if self.first_child is not None:
-            return len(self.children)
+        """ Return the number of children of the node, in O(1)."""
+        if self._first_child is not None:
+            return 1 + len(self._first_child._siblings)
         else:
             return 0
 
+    @property
+    def height(self) -> int:
+        """Return the height of the subtree rooted at the node (0 for a leaf),
+        cached along with its size (see __len__)."""
+        return self._measure()["height"]
+
     def add_child(self, child: "Node") -> NoReturn:
         """Add a child to a node. Given the chained implementation this
         means modifying the `self._first_child` property for leaf nodes.
@@ -321,6 +307,10 @@ def add_child(self, child: "Node") -> NoReturn:
 
         if not self._first_child:
             self._first_child = child
+            # the siblings the child already has become children as well
+            for node in (child, *child._siblings):
+                node._parents.append(self)
+                self._grow(node)
         else:
             self._first_child.add_sibling(child)
 
@@ -333,6 +323,11 @@ def add_sibling(self, node: "Node") -> NoReturn:
             raise TypeError(self.__type_error(node))
         else:
             self._siblings.append(node)
+            # only the siblings of a first child are children of its parents
+            for parent in self._parents:
+                if parent._first_child is self:
+                    node._parents.append(parent)
+                    parent._grow(node)
 
     def add_siblings(self, *args) -> NoReturn:
         """Add a sibling to the current node for each arg in args.
@@ -347,9 +342,69 @@ def add_siblings(self, *args) -> NoReturn:
             for arg in args:
                 self.add_sibling(arg)
 
+    def _grow(self, child: "Node") -> NoReturn:
+        """
+        Private method, do not call.
+        Update the cached values of the node and of its ancestors after
+        `child` (and its subtree) was attached to the node : sizes and
+        heights are updated in place, rendered strings are dropped.
+
+        Values are only cached on a node along with all of its descendants,
+        so the walk stops at the first ancestor having none, which keeps
+        building a tree linear in its size. For the same reason, the subtree
+        of `child` is measured if the node has cached values.
+
+        A node shared by several trees has several parents : every path to
+        the roots is walked, as sizes count the nodes once per path.
+        """
+        if not self._cache:
+            return
+        measures = child._measure()
+        self._propagate(measures["size"], measures["height"] + 1)
+
+    def _changed(self) -> NoReturn:
+        """
+        Private method, do not call.
+        Drop the rendered strings of the ancestors of the node after its
+        content (a Queue) was modified.
+        """
+        self._propagate(0, 0)
+
+    def _propagate(self, size: int, height: int) -> NoReturn:
+        """
+        Private method, do not call.
+        Add `size` nodes, `height` levels below the node, to the cached
+        values of the node and of all of its ancestors (see _grow()).
+        """
+        stack: List[Tuple[Node, int]] = [(self, height)]
+        while stack:
+            node, height = stack.pop()
+            if not node._cache:
+                continue
+            node._cache.pop("render", None)
+            if "size" in node._cache:
+                node._cache["size"] += size
+                node._cache["height"] = max(node._cache["height"], height)
+            stack.extend((parent, height + 1) for parent in node._parents)
+
+    def _measure(self) -> Dict[str, Any]:
+        """
+        Private method, do not call.
+        Return the cached values of the node, computing the size and height
+        of every node of its subtree, in postorder, if not known yet.
+        """
+        if "size" not in self._cache:
+            for node in self.postorder():
+                size, height = 1, 0
+                for child in node.children or ():
+                    size += child._cache["size"]
+                    height = max(height, child._cache["height"] + 1)
+                node._cache.update(size=size, height=height)
+        return self._cache
+
     def is_leaf(self):
         """ Return True if the node has no children, False otherwise."""
-        return True if self.children is None else False
+        return self._first_child is None
 
     def content_is_iterable(self) -> bool:
         """ Check if the content of a node is iterable by duck-typing """
@@ -363,6 +418,44 @@ def content_isinstance(self, cls) -> bool:
         """ wrapper for isinstance(self._content, cls) """
         return isinstance(self._content, cls)
 
+    def _events(self) -> Iterator[Tuple["Node", bool]]:
+        """
+        Private method, do not call.
+        Depth-first transversal of the subtree rooted at the node, with an
+        explicit stack : yield (node, False) when entering a node, and
+        (node, True) when leaving it, after all of its descendants.
+        """
+        stack: List[Tuple[Node, bool]] = [(self, False)]
+        while stack:
+            node, leaving = stack.pop()
+            yield node, leaving
+            if not leaving:
+                stack.append((node, True))
+                if node.first_child is not None:
+                    stack.extend((child, False) for child in reversed(node.children))
+
+    def preorder(self) -> Iterator["Node"]:
+        """ Lazily iterate over the subtree, each node before its children."""
+        return (node for node, leaving in self._events() if not leaving)
+
+    def postorder(self) -> Iterator["Node"]:
+        """ Lazily iterate over the subtree, each node after its children."""
+        return (node for node, leaving in self._events() if leaving)
+
+    def level_order(self) -> Iterator[Tuple[int, "Node"]]:
+        """Lazily iterate over the subtree level by level (breadth-first),
+        yielding (depth, node) tuples, the depth of this node being 0."""
+        queue: Deque[Tuple[int, Node]] = deque([(0, self)])
+        while queue:
+            depth, node = queue.popleft()
+            yield depth, node
+            if node.first_child is not None:
+                queue.extend((depth + 1, child) for child in node.children)
+
+    def leaves(self) -> Iterator["Node"]:
+        """ Lazily iterate over the leaves of the subtree, from left to right."""
+        return (node for node in self.preorder() if node.is_leaf())
+
 
 class Tree(object):
     """
@@ -402,7 +495,6 @@ def from_parentheses_and_sequence(cls, parentheses: str, sequence: str):
     def __init__(self, root: Node):
         self._root: Node = root
         self.__uuid: str = hex(id(self))
-        self.__elements: List[str] = []
 
     def __repr__(self) -> str:
         elems: List[str] = [
@@ -459,132 +551,694 @@ def root(self) -> Node:
     @property
     def size(self) -> int:
         """ Return the number of nodes of the tree """
-        return self._count_depth_first_transversal()
-
-    # TODO : find a utility for this or remove it
-    def _breath_first_transversal(self):
-        """ DO NOT CALL, experimental. """
-        queue: Queue = Queue()
-        queue.enqueue(self._root)
-        level_queue: Queue = Queue()
-
-        tree_map: Dict[int, Node] = {0: [self._root]}
-        level: int = 0
-
-        while not queue.is_empty():
-            current: Queue = queue.dequeue()
-            yield current
-            # print(current.content, end="")
-            if current.children:
-                # level += 1
-                for child in current.children:
-                    queue.enqueue(child)
-                    # level_queue.enqueue(child)
-
-                # tree_map.update({level: level_queue.items})
-                # level_queue.empty()
-
-    def maximum_common_subtree(self, other: "Tree") -> "Tree":
-        """ Wrapper for Node._maximum_common_subtree() """
-        if not isinstance(other, Tree):
+        return len(self._root)
+
+    @property
+    def height(self) -> int:
+        """ Return the height of the tree : the depth of its deepest node."""
+        return self._root.height
+
+    def preorder(self) -> Iterator[Node]:
+        """ Wrapper for self.root.preorder() """
+        return self._root.preorder()
+
+    def postorder(self) -> Iterator[Node]:
+        """ Wrapper for self.root.postorder() """
+        return self._root.postorder()
+
+    def level_order(self) -> Iterator[Tuple[int, Node]]:
+        """ Wrapper for self.root.level_order() """
+        return self._root.level_order()
+
+    def leaves(self) -> Iterator[Node]:
+        """ Wrapper for self.root.leaves() """
+        return self._root.leaves()
+
+    def maximum_common_subtree(
+        self, other: "Tree", compare_bases: bool = False
+    ) -> List[Tuple[int, int]]:
+        """Wrapper for ArrayTree.maximum_common_subtree() : nodes are identified
+        by their index in self.preorder() and other.preorder()."""
+        if not isinstance(other, (Tree, ArrayTree)):
             raise TypeError(
-                f"Cannot calculate a maximum commun subtree respect to an instance of {type(other)}"
+                f"Cannot calculate a maximum common subtree with an instance of "
+                f"{type(other)}"
             )
-        direct = Tree(self.root._maximum_common_subtree(self.root, other.root))
-        inverse = Tree(self.root._maximum_common_subtree(other.root, self.root))
-
-        if len(direct) >= len(inverse):
-            return direct
-        else:
-            return inverse
-
-    def __reset_elements(self):
-        """Private method to be called before and after a call to
-        self._depth_first_transversal()."""
-        self.__elements = []
+        return ArrayTree.from_tree(self).maximum_common_subtree(other, compare_bases)
 
     def to_sequence(self) -> str:
         """Rebuild the character sequence that generated the tree contentents.
-        The string is built by performing a `depth first transversal`
-        on a copy of the tree."""
-        self.__reset_elements()
-        self._depth_first_transversal(mode="sequence")
-        sequence: str = "".join(self.__elements)
-        self.__reset_elements()
-        return sequence
+        The string is cached until the tree is modified (see Node.add_child)."""
+        return self._render()[0]
 
     def to_parentheses(self) -> str:
         """Rebuild the parenthesised expression that generated the tree structure.
-        The string is built by performing a `depth first transversal`
-        on a copy of the tree."""
-        self.__reset_elements()
-        self._depth_first_transversal(mode="parenthesis")
-        parentheses: str = "".join(self.__elements)
-        self.__reset_elements()
-        return parentheses
+        The string is cached until the tree is modified (see Node.add_child)."""
+        return self._render()[1]
 
     def to_wuss_format(self) -> str:
         """ Wrapper for self.to_parentheses() """
         return self.to_parentheses()
 
-    def _depth_first_transversal(
-        self,
-        mode: str,
-        node: Optional[Node] = None,
-        pairs_stack: Optional[Stack] = None,
-    ) -> NoReturn:
-        """Perform a depth-first transversal on a copy of the Tree.
-        This method needs to operate on a copy and not the tree itself because
-        modifies the content of nodes which represent base pairs in the structure.
-
-        This method will modify a private instance attribute self.__elements
-        which is used to rebuild the sequence and/or parenthesised expression
-        that the tree represents.
+    def _render(self) -> Tuple[str, str]:
+        """
+        Private method, do not call.
+        Rebuild both the sequence and the parenthesised expression in a single
+        depth-first transversal (see Node._events()) : the nodes are left
+        untouched, their Queue being read without dequeuing. The result is
+        cached on the root, every node being marked as observed so that
+        Node._grow() reaches the root when any of them changes, as does
+        Node._changed() when the Queue of a paired node is modified.
         """
-        _valid_modes: List[str] = ["sequence", "parenthesis"]
-        if mode not in _valid_modes:
-            raise ValueError(f"Unknown mode {mode}. Valid modes are : {_valid_modes}")
+        root: Node = self.root
+        if "render" in root._cache:
+            return root._cache["render"]
+
+        sequence: List[str] = []
+        parentheses: List[str] = []
+        for node, leaving in root._events():
+            if leaving:
+                if node.content_isinstance(Queue):
+                    bases = node.content.items
+                    if len(bases) > 1:
+                        sequence.append(bases[0])
+                    parentheses.append(")")
+                continue
+
+            node._cache["observed"] = True
+            if node.content_isinstance(str):
+                sequence.append(node.content)
+                parentheses.append("-")
+            elif node.content_isinstance(Queue):
+                sequence.append(node.content.peek())
+                parentheses.append("(")
+
+        root._cache["render"] = ("".join(sequence), "".join(parentheses))
+        return root._cache["render"]
+
+
+class NodeView(object):
+    """
+    Lightweight view of one node of an ArrayTree, created on demand.
+
+    It holds no data but a reference to its tree and the (preorder) index of
+    the node, and offers the read-only interface of Node : children, degree,
+    is_leaf(), content... The content of a base-paired node is rebuilt as a
+    Queue holding its two bases, as in Tree.
+
+    Note : the siblings of a view are the siblings following it, which, for
+    the first child of a node, are the same as those of Node.
+    """
+
+    __slots__ = ("_tree", "_index")
+
+    def __init__(self, tree: "ArrayTree", index: int):
+        self._tree: ArrayTree = tree
+        self._index: int = index
+
+    def __repr__(self):
+        return f"NodeView({self.content})"
+
+    def __str__(self):
+        return f"{self.content}"
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, NodeView)
+            and self._tree is other._tree
+            and self._index == other._index
+        )
+
+    def __hash__(self):
+        return hash((id(self._tree), self._index))
+
+    def __len__(self):
+        """ Number of nodes of the subtree rooted at the node."""
+        return int(self._tree._sizes[self._index])
+
+    @property
+    def index(self) -> int:
+        """ Preorder index of the node in its tree."""
+        return self._index
+
+    @property
+    def id(self) -> str:
+        """ A unique representation of the node : its tree and its index."""
+        return f"{hex(id(self._tree))}:{self._index}"
+
+    @property
+    def content(self) -> Any:
+        """ The base(s) of the node : a Queue if paired, a string otherwise."""
+        tree, index = self._tree, self._index
+        kind = tree._kind[index]
+        if kind == ArrayTree.PAIRED:
+            content = Queue()
+            content.enqueue(*(chr(base) for base in tree._bases[index] if base))
+            return content
+        if kind == ArrayTree.UNPAIRED:
+            return chr(tree._bases[index, 0])
+        return None
+
+    def __view(self, index: int) -> Union[None, "NodeView"]:
+        """ Private method, do not call. View of another node of the tree."""
+        return NodeView(self._tree, int(index)) if index >= 0 else None
+
+    @property
+    def parent(self) -> Union[None, "NodeView"]:
+        return self.__view(self._tree._parent[self._index])
+
+    @property
+    def first_child(self) -> Union[None, "NodeView"]:
+        return self.__view(self._tree._first_child[self._index])
+
+    @property
+    def siblings(self) -> List["NodeView"]:
+        """ Views of the siblings following the node."""
+        siblings: List[NodeView] = []
+        index = self._tree._next_sibling[self._index]
+        while index >= 0:
+            siblings.append(NodeView(self._tree, int(index)))
+            index = self._tree._next_sibling[index]
+        return siblings
+
+    @property
+    def children(self) -> Union[None, List["NodeView"]]:
+        """ Views of the children of the node, None for a leaf."""
+        first_child = self.first_child
+        if first_child is None:
+            return None
+        return [first_child] + first_child.siblings
+
+    @property
+    def degree(self) -> int:
+        """ Return the number of children of the node """
+        return int(self._tree._degree[self._index])
+
+    @property
+    def height(self) -> int:
+        """ Return the height of the subtree rooted at the node."""
+        depth = self._tree._depth
+        subtree = depth[self._index : self._index + len(self)]
+        return int(subtree.max() - depth[self._index])
+
+    def is_leaf(self) -> bool:
+        """ Return True if the node has no children, False otherwise."""
+        return bool(self._tree._first_child[self._index] < 0)
+
+    def content_isinstance(self, cls) -> bool:
+        """ wrapper for isinstance(self.content, cls) """
+        return isinstance(self.content, cls)
+
+    def __subtree(self, order: str) -> np.ndarray:
+        """ Private method, do not call. Indices of the subtree, in `order`."""
+        return self._tree._order(order, self._index, self._index + len(self))
+
+    def __views(self, order: str) -> Iterator["NodeView"]:
+        """ Private method, do not call. Views of the subtree, in `order`."""
+        return (NodeView(self._tree, index) for index in self.__subtree(order).tolist())
+
+    def preorder(self) -> Iterator["NodeView"]:
+        """ Lazily iterate over the subtree, each node before its children."""
+        return self.__views("pre")
+
+    def postorder(self) -> Iterator["NodeView"]:
+        """ Lazily iterate over the subtree, each node after its children."""
+        return self.__views("post")
+
+    def level_order(self) -> Iterator[Tuple[int, "NodeView"]]:
+        """Lazily iterate over the subtree level by level (breadth-first),
+        yielding (depth, node) tuples, the depth of this node being 0."""
+        indices = self.__subtree("level")
+        depths = self._tree._depth[indices] - self._tree._depth[self._index]
+        return (
+            (depth, NodeView(self._tree, index))
+            for depth, index in zip(depths.tolist(), indices.tolist())
+        )
+
+    def leaves(self) -> Iterator["NodeView"]:
+        """ Lazily iterate over the leaves of the subtree, from left to right."""
+        return self.__views("leaves")
 
-        node: Node = node or self.root
-        node = copy.deepcopy(node)
-        pairs_stack: Stack = pairs_stack or Stack()
 
-        if node.content_isinstance(str):
-            if mode == _valid_modes[0]:
-                self.__elements.append(node.content)
+class ArrayTree(object):
+    """
+    Compact, immutable alternative to Tree, with the same public interface.
+
+    Instead of one Node (holding a list of siblings, and a Queue for base
+    pairs) per base, the whole tree is stored in parallel NumPy arrays,
+    indexed by the preorder rank of the nodes (0 being the root) :
+
+        parent       : index of the parent of each node, -1 for the root.
+        first_child  : index of its first child, -1 for leaves.
+        next_sibling : index of its next sibling, -1 for last children.
+        kind         : ArrayTree.ROOT, UNPAIRED or PAIRED.
+        bases        : (n_nodes, 2) ASCII codes of the base of an unpaired
+                       node, or of the two bases of a pair, 0 where there is
+                       none.
+
+    Nodes are accessed through NodeView objects, created on demand.
+
+    >>> tree = ArrayTree.from_parentheses_and_sequence("((-(--))-)", "GACAUCGUCA")
+    >>> tree.root.children
+    [NodeView(Queue : ['A', 'G']-> head)]
+    """
+
+    # kinds of nodes
+    ROOT: int = 0
+    UNPAIRED: int = 1
+    PAIRED: int = 2
+
+    # children tables of fewer cells are aligned in pure Python, where NumPy
+    # would only add overhead (see maximum_common_subtree())
+    _vector_cells: int = 256
+
+    @classmethod
+    def from_parentheses_and_sequence(cls, parentheses: str, sequence: str):
+        """Build the tree of a parenthesised expression, as does
+        Tree.from_parentheses_and_sequence(), in a single pass.
+
+        Raises ValueError on unknown characters and unbalanced expressions.
+        """
+        parents: List[int] = [-1]
+        kinds: List[int] = [cls.ROOT]
+        firsts: List[str] = ["\0"]
+        seconds: List[str] = ["\0"]
+        stack: List[int] = [0]
+
+        for char, base in zip(parentheses, sequence):
+            if char == "(" or char == "-":
+                parents.append(stack[-1])
+                kinds.append(cls.PAIRED if char == "(" else cls.UNPAIRED)
+                firsts.append(base)
+                seconds.append("\0")
+                if char == "(":
+                    stack.append(len(parents) - 1)
+            elif char == ")":
+                if len(stack) == 1:
+                    raise ValueError("Unbalanced parenthesised expression")
+                seconds[stack.pop()] = base
             else:
-                self.__elements.append("-")
+                raise ValueError(
+                    f"Parenthesised expression contains unknown character {char}"
+                )
+        if len(stack) > 1:
+            raise ValueError("Unbalanced parenthesised expression")
+
+        bases = np.frombuffer(
+            "".join(firsts + seconds).encode("ascii"), dtype=np.uint8
+        ).reshape(2, -1)
+        return cls(parents, kinds, bases.T)
 
-        elif node.content_isinstance(Queue):
-            if mode == _valid_modes[0]:
-                self.__elements.append(node.content.dequeue())
-                pairs_stack.push(node.content.dequeue())
+    @classmethod
+    def from_tree(cls, tree: "Tree") -> "ArrayTree":
+        """ Convert a Tree (made of Node objects) to an ArrayTree."""
+        parents, kinds, bases = [], [], []
+        stack = Stack()
+        stack.push((tree.root, -1))
+        while not stack.is_empty():
+            node, parent = stack.pop()
+            index = len(parents)
+            parents.append(parent)
+            if node.content_isinstance(Queue):
+                pair = list(node.content) + [""]
+                kinds.append(cls.PAIRED)
+                bases.append((ord(pair[0]), ord(pair[1]) if pair[1] else 0))
+            elif node.content_isinstance(str):
+                kinds.append(cls.UNPAIRED)
+                bases.append((ord(node.content), 0))
             else:
-                self.__elements.append("(")
-                pairs_stack.push(None)
+                kinds.append(cls.ROOT)
+                bases.append((0, 0))
+            # push children last to first, so that they are popped in order
+            for child in reversed(node.children or []):
+                stack.push((child, index))
+        return cls(parents, kinds, np.array(bases, dtype=np.uint8).reshape(-1, 2))
+
+    def __init__(
+        self,
+        parent: Iterable[int],
+        kind: Iterable[int],
+        bases: np.ndarray,
+    ):
+        self._parent: np.ndarray = np.array(parent, dtype=np.int32)
+        self._kind: np.ndarray = np.array(kind, dtype=np.uint8)
+        self._bases: np.ndarray = np.array(bases, dtype=np.uint8)
+        n = len(self._parent)
+        if not n or len(self._kind) != n or self._bases.shape != (n, 2):
+            raise ValueError(
+                "parent, kind and bases should describe the same non-empty "
+                "list of nodes"
+            )
+        self._depth, self._sizes = self.__layout(self._parent)
+
+        self._degree: np.ndarray = np.bincount(self._parent[1:], minlength=n)
+        # children are in increasing order : assign them last to first
+        children = np.arange(n - 1, 0, -1, dtype=np.int32)
+        self._first_child: np.ndarray = np.full(n, -1, dtype=np.int32)
+        self._first_child[self._parent[children]] = children
+        order = np.argsort(self._parent[1:], kind="stable") + 1
+        same = self._parent[order[1:]] == self._parent[order[:-1]]
+        self._next_sibling: np.ndarray = np.full(n, -1, dtype=np.int32)
+        self._next_sibling[order[:-1][same]] = order[1:][same]
 
-        if not node.is_leaf():
-            for child in node.children:
-                self._depth_first_transversal(mode, child, pairs_stack)
+    @staticmethod
+    def __layout(parent: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Private method, do not call.
+        Depth and subtree size of every node, checking that `parent`
+        describes a tree in preorder : the parent of node k must be on the
+        path from the root to node k - 1.
+        """
+        parents = parent.tolist()
+        if parents[0] != -1:
+            raise ValueError("The first node should be the root, of parent -1")
+        n = len(parents)
+        depth, sizes = [0] * n, [0] * n
+        path: List[int] = [0]
+        for index in range(1, n):
+            while path and path[-1] != parents[index]:
+                # the subtree of the node left behind is complete
+                closed = path.pop()
+                sizes[closed] = index - closed
+            if not path:
+                raise ValueError(f"Node {index} is not in preorder")
+            depth[index] = len(path)
+            path.append(index)
+        for closed in path:
+            sizes[closed] = n - closed
+        return np.array(depth, dtype=np.int32), np.array(sizes, dtype=np.int32)
 
-            if not pairs_stack.is_empty():
-                if mode == _valid_modes[0]:
-                    self.__elements.append(pairs_stack.pop())
-                else:
-                    self.__elements.append(")")
-                    pairs_stack.pop()
+    def __repr__(self) -> str:
+        elems: List[str] = [
+            f"RNA Secondary Structure Tree at {hex(id(self))}",
+            f" Structure : {self.to_parentheses()}",
+            f" Sequence  : {self.to_sequence()}",
+        ]
+        return "\n".join(elems)
 
-    def _count_depth_first_transversal(
-        self,
-        node: Optional[Node] = None,
-    ) -> int:
-        """Perform a depth-first transversal to count the number of nodes in the tree."""
+    def __len__(self):
+        """ Wrapper for self.size """
+        return self.size
 
-        node: Node = node or self.root
+    def __eq__(self, other):
+        return self.equals(other)
 
-        if not node.is_leaf():
-            return 1 + sum(
-                self._count_depth_first_transversal(child) for child in node.children
+    def __contains__(self, other):
+        if not isinstance(other, (Tree, ArrayTree)):
+            raise TypeError(
+                f"Cannot compare instance of ArrayTree to instance of {type(other)}"
             )
-        else:
-            return 1
+        return other.to_parentheses() in self.to_parentheses()
+
+    def equals(self, other: Union["Tree", "ArrayTree"]) -> bool:
+        """ Do both trees have the same shape ? (regardless of their bases)"""
+        if isinstance(other, Tree):
+            other = ArrayTree.from_tree(other)
+        if not isinstance(other, ArrayTree):
+            raise TypeError(
+                f"Cannot compare instance of ArrayTree to instance of {type(other)}"
+            )
+        return np.array_equal(self._parent, other._parent)
+
+    def is_empty(self) -> bool:
+        """Return True if there are no nodes other than the root
+        i.e. the root is a leaf (has no children)."""
+        return self.size == 1
+
+    @property
+    def root(self) -> NodeView:
+        """ Return a view of the root of the tree. """
+        return NodeView(self, 0)
+
+    @property
+    def size(self) -> int:
+        """ Return the number of nodes of the tree """
+        return len(self._parent)
+
+    @property
+    def height(self) -> int:
+        """ Return the height of the tree : the depth of its deepest node."""
+        return int(self._depth.max())
+
+    @property
+    def parent(self) -> np.ndarray:
+        return self._parent
+
+    @property
+    def kind(self) -> np.ndarray:
+        return self._kind
+
+    @property
+    def bases(self) -> np.ndarray:
+        return self._bases
+
+    def _order(self, order: str, start: int, stop: int) -> np.ndarray:
+        """
+        Private method, do not call.
+        Indices of the nodes start to stop - 1 (a subtree, or the whole tree)
+        in "pre", "post" or "level" order, or of its "leaves". In postorder,
+        a node comes after its subtree, [k, k + size), and after the nodes of
+        greater depth ending at the same place.
+        """
+        nodes = np.arange(start, stop)
+        if order == "post":
+            ends = nodes + self._sizes[nodes]
+            return nodes[np.lexsort((-self._depth[nodes], ends))]
+        if order == "level":
+            return nodes[np.argsort(self._depth[nodes], kind="stable")]
+        if order == "leaves":
+            return nodes[self._first_child[nodes] < 0]
+        return nodes
+
+    def preorder(self) -> Iterator[NodeView]:
+        """ Wrapper for self.root.preorder() """
+        return self.root.preorder()
+
+    def postorder(self) -> Iterator[NodeView]:
+        """ Wrapper for self.root.postorder() """
+        return self.root.postorder()
+
+    def level_order(self) -> Iterator[Tuple[int, NodeView]]:
+        """ Wrapper for self.root.level_order() """
+        return self.root.level_order()
+
+    def leaves(self) -> Iterator[NodeView]:
+        """ Wrapper for self.root.leaves() """
+        return self.root.leaves()
+
+    def _events(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Private method, do not call.
+        Nodes and sides (0 : opening or unpaired base, 1 : closing base) of
+        the characters of the parenthesised expression, in order. The closing
+        base of a pair comes right after its subtree, and before the closing
+        bases of enclosing pairs ending at the same place.
+        """
+        nodes = np.flatnonzero(self._kind != self.ROOT)
+        pairs = np.flatnonzero(self._kind == self.PAIRED)
+        ends = pairs + self._sizes[pairs]
+        position = np.concatenate([nodes, ends])
+        side = np.concatenate([np.zeros_like(nodes), np.ones_like(pairs)])
+        nesting = np.concatenate([np.zeros_like(nodes), -self._depth[pairs]])
+        # closing bases (side 1) come before the node opened at the same place
+        order = np.lexsort((nesting, -side, position))
+        return np.concatenate([nodes, pairs])[order], side[order]
+
+    def to_sequence(self) -> str:
+        """ Rebuild the character sequence that generated the tree contents."""
+        nodes, side = self._events()
+        codes = self._bases[nodes, side]
+        return codes[codes > 0].tobytes().decode("ascii")
+
+    def to_parentheses(self) -> str:
+        """ Rebuild the parenthesised expression that generated the tree."""
+        nodes, side = self._events()
+        chars = np.where(self._kind[nodes] == self.PAIRED, ord("("), ord("-"))
+        chars[side == 1] = ord(")")
+        return chars.astype(np.uint8).tobytes().decode("ascii")
+
+    def to_wuss_format(self) -> str:
+        """ Wrapper for self.to_parentheses() """
+        return self.to_parentheses()
+
+    def to_tree(self) -> "Tree":
+        """ Convert to a Tree made of Node objects."""
+        nodes: List[Node] = []
+        for index, parent in enumerate(self._parent.tolist()):
+            node = Node(NodeView(self, index).content)
+            if parent >= 0:
+                nodes[parent].add_child(node)
+            nodes.append(node)
+        return Tree(nodes[0])
+
+    def _children_lists(self) -> List[List[int]]:
+        """ Private method, do not call. Children of every node, in order."""
+        children: List[List[int]] = [[] for _ in range(self.size)]
+        for index, parent in enumerate(self._parent[1:].tolist(), start=1):
+            children[parent].append(index)
+        return children
+
+    @staticmethod
+    def _align_children(
+        weights: Union[List[List[int]], np.ndarray]
+    ) -> Union[List[List[int]], np.ndarray]:
+        """
+        Private method, do not call.
+        Dynamic programming table of the best order-preserving matching of
+        two sequences of children, where matching children i and j scores
+        weights[i][j] : table[i][j] is the best score using the first i and
+        j children (a weighted longest common subsequence).
+
+        Nested lists are aligned in pure Python. For an array, each row is
+        computed at once : table[i + 1, j + 1] is the running maximum over j
+        of max(table[i, j + 1], table[i, j] + weights[i, j]).
+        """
+        if not isinstance(weights, np.ndarray):
+            cols = len(weights[0]) if weights else 0
+            lists: List[List[int]] = [[0] * (cols + 1)]
+            for row in weights:
+                previous, current = lists[-1], [0]
+                for j, weight in enumerate(row):
+                    current.append(
+                        max(previous[j + 1], current[j], previous[j] + weight)
+                    )
+                lists.append(current)
+            return lists
+
+        rows, cols = weights.shape
+        table = np.zeros((rows + 1, cols + 1), dtype=np.intp)
+        for i in range(rows):
+            previous = table[i]
+            np.maximum.accumulate(
+                np.maximum(previous[1:], previous[:-1] + weights[i]),
+                out=table[i + 1, 1:],
+            )
+        return table
+
+    @staticmethod
+    def _matched_children(
+        weights: Union[List[List[int]], np.ndarray],
+        table: Union[List[List[int]], np.ndarray],
+    ) -> List[Tuple[int, int]]:
+        """ Private method, do not call. Traceback of _align_children()."""
+        matches: List[Tuple[int, int]] = []
+        i, j = len(table) - 1, len(table[0]) - 1
+        while i and j:
+            weight = weights[i - 1][j - 1]
+            if weight and table[i][j] == table[i - 1][j - 1] + weight:
+                matches.append((i - 1, j - 1))
+                i, j = i - 1, j - 1
+            elif table[i][j] == table[i - 1][j]:
+                i -= 1
+            else:
+                j -= 1
+        return matches[::-1]
+
+    def maximum_common_subtree(
+        self, other: Union["Tree", "ArrayTree"], compare_bases: bool = False
+    ) -> List[Tuple[int, int]]:
+        """
+        Maximum common rooted, ordered subtree of both trees : the largest
+        mapping of nodes of self to nodes of other such that the roots are
+        mapped together, the parent of a mapped node is mapped to the parent
+        of its image, and the order of siblings is preserved. Only nodes of
+        the same kind (paired with paired, unpaired with unpaired) and, if
+        `compare_bases`, holding the same bases, are mapped together.
+
+        Return the mapping as a list of (index in self, index in other)
+        tuples, in preorder, where indices are those of self.preorder() and
+        other.preorder(), e.g. len(mapping) is the size of the subtree.
+
+        The score M(u, v) of the largest common subtree rooted at nodes u and
+        v is 1 plus the best order-preserving matching of their children,
+        weighted by M (see _align_children()) : it is memoized for every pair
+        of internal nodes, visited with an explicit stack from the roots, in
+        O(sum of deg(u) * deg(v)) over the pairs of nodes at the same depth.
+        Large tables are computed with NumPy, the weights of leaves, 1 if
+        compatible, being compared as arrays, and all the tables are kept for
+        the traceback of the mapping.
+        """
+        if isinstance(other, Tree):
+            other = ArrayTree.from_tree(other)
+        if not isinstance(other, ArrayTree):
+            raise TypeError(
+                f"Cannot calculate a maximum common subtree with an instance of "
+                f"{type(other)}"
+            )
+        mine, theirs = self._children_lists(), other._children_lists()
+        kinds, other_kinds = self._kind.tolist(), other._kind.tolist()
+        bases, other_bases = self._bases.tolist(), other._bases.tolist()
+
+        def compatible(u: int, v: int) -> bool:
+            if kinds[u] != other_kinds[v]:
+                return False
+            return not compare_bases or bases[u] == other_bases[v]
+
+        # scores of the pairs of internal nodes, leaves scoring 1 if compatible
+        scores: Dict[Tuple[int, int], int] = {}
+        # weights and tables of the children of the pairs of internal nodes
+        tables: Dict[Tuple[int, int], Tuple[Any, Any]] = {}
+
+        def score(u: int, v: int) -> int:
+            if not compatible(u, v):
+                return 0
+            return scores[u, v] if mine[u] and theirs[v] else 1
+
+        def weights(u: int, v: int) -> Union[List[List[int]], np.ndarray]:
+            children, other_children = mine[u], theirs[v]
+            if len(children) * len(other_children) < self._vector_cells:
+                return [[score(c, d) for d in other_children] for c in children]
+            matrix = (
+                self._kind[children][:, None] == other._kind[other_children]
+            ).astype(np.intp)
+            if compare_bases:
+                matrix *= (
+                    self._bases[children][:, None] == other._bases[other_children]
+                ).all(axis=2)
+            rows = [i for i, c in enumerate(children) if mine[c]]
+            cols = [j for j, d in enumerate(other_children) if theirs[d]]
+            if rows and cols:
+                internal = [
+                    [scores.get((children[i], other_children[j]), 0) for j in cols]
+                    for i in rows
+                ]
+                matrix[np.ix_(rows, cols)] *= np.array(internal, dtype=np.intp)
+            return matrix
+
+        if not compatible(0, 0):
+            return []
+        stack: List[Tuple[int, int]] = [(0, 0)]
+        while stack:
+            u, v = stack[-1]
+            if (u, v) in scores:
+                stack.pop()
+                continue
+            pending = [
+                (c, d)
+                for c in mine[u]
+                if mine[c]
+                for d in theirs[v]
+                if theirs[d] and (c, d) not in scores and compatible(c, d)
+            ]
+            if pending:
+                stack.extend(pending)
+                continue
+            best = 1
+            if mine[u] and theirs[v]:
+                pair_weights = weights(u, v)
+                table = self._align_children(pair_weights)
+                tables[u, v] = (pair_weights, table)
+                best += int(table[-1][-1])
+            scores[u, v] = best
+            stack.pop()
+
+        mapping: List[Tuple[int, int]] = []
+        stack = [(0, 0)]
+        while stack:
+            u, v = stack.pop()
+            mapping.append((u, v))
+            if (u, v) not in tables:
+                continue
+            for i, j in self._matched_children(*tables[u, v]):
+                stack.append((mine[u][i], theirs[v][j]))
+        return sorted(mapping)
@@ -1,59 +1,829 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
 import numpy as np
+from numpy.lib.stride_tricks import as_strided, sliding_window_view
 from .sequence import Sequence
+from .datastructures import Stack, Tree
+from .cache import FoldCache
+from .scoring import ScoringModel
+from .triangular import TriangularMatrix, smallest_int_dtype
 
 
 # TODO : integrate these methods to Sequence
 class RNAStruct(Sequence):
-    """ Calculate secondary structure by dynamic programming """
+    """
+    Calculate secondary structure by dynamic programming.
+
+    If `max_span` is given, only base pairs (i, j) with j - i <= max_span
+    are considered : the matrix then holds the cells of the first
+    max_span diagonals only, which costs O(n * max_span) in space and
+    O(n * max_span^2) in time, and is the way to fold long sequences.
+
+    The score of each base pair is given by a ScoringModel (G-U wobble,
+    weighted pairs, minimum hairpin loop length). By default, every
+    Watson-Crick pair scores 1 and max_n_pairs is the number of pairs.
+
+    The matrix can be filled by several backends, which all produce the
+    same matrix, hence the same scores and tracebacks :
+        "dense"  : every cell evaluates every bifurcation (default).
+        "sparse" : only candidate pairs are visited, see self._sparse_fill().
+        "four_russians" : O(n^3 / log n) lookup-table algorithm, restricted
+                   to scoring models where every allowed pair scores 1,
+                   see self._four_russians_fill().
+
+    When a FoldCache is given as `cache`, max_n_pairs and the tracebacks
+    (pair_table(), to_parentheses(), to_tree()) are looked up in the cache
+    first, and only a miss fills the matrix.
+    """
+
+    # Fill method of each backend.
+    _backends: Dict[str, str] = {
+        "dense": "_dense_fill",
+        "sparse": "_sparse_fill",
+        "four_russians": "_four_russians_fill",
+    }
 
-    def __init__(self, sequence: str):
+    # Block size of the Four-Russians backend, None to derive it from n.
+    _russians_block: Optional[int] = None
+
+    # Upper bound on the number of temporary cells allocated
+    # when reducing the bifurcation term of a diagonal.
+    _block_cells: int = 1 << 22
+
+    def __init__(
+        self,
+        sequence: str,
+        max_span: Optional[int] = None,
+        scoring: Optional[ScoringModel] = None,
+        backend: str = "dense",
+        cache: Optional[FoldCache] = None,
+    ):
         super().__init__(sequence)
+        if max_span is not None and max_span < 1:
+            raise ValueError(f"max_span should be a positive integer, not {max_span}")
+        if backend not in self._backends:
+            raise ValueError(
+                f"Unknown backend {backend}. "
+                f"Valid backends are : {list(self._backends)}"
+            )
+        if scoring is not None and not isinstance(scoring, ScoringModel):
+            raise TypeError(f"scoring should be a ScoringModel, not {type(scoring)}")
+        if cache is not None and not isinstance(cache, FoldCache):
+            raise TypeError(f"cache should be a FoldCache, not {type(cache)}")
         self._n = n = len(self.sequence)
-        self._matrix = np.zeros((n, n), dtype=int)
+        self._scoring: ScoringModel = scoring or ScoringModel()
+        if backend == "four_russians" and set(self._scoring.weights.values()) - {1}:
+            raise ValueError(
+                "The four_russians backend requires every allowed pair to score 1"
+            )
+        # pair scores and matrix are only allocated when first needed (see
+        # _scores and _matrix), so that a cache hit stays O(n)
+        self.__max_span: Optional[int] = max_span
+        self.__scores: Optional[TriangularMatrix] = None
+        self.__matrix: Optional[TriangularMatrix] = None
+        self._backend: str = backend
+        self._filled: bool = False
+        self._prefix: Optional[np.ndarray] = None
+        self._suffix: Optional[np.ndarray] = None
+        self._outside: Optional[np.ndarray] = None
+        self._pairs: Optional[np.ndarray] = None
+        self._cache: Optional[FoldCache] = cache
+        self._score = None
+
+    @property
+    def backend(self) -> str:
+        """ Name of the algorithm used to fill the matrix."""
+        return self._backend
+
+    @property
+    def scoring(self) -> ScoringModel:
+        """ The ScoringModel giving the score of each base pair."""
+        return self._scoring
+
+    @property
+    def _scores(self) -> TriangularMatrix:
+        """
+        Private property, do not use.
+        Pair scores, computed once on first use, in the layout of the matrix.
+        """
+        if self.__scores is None:
+            self.__scores = self._pair_scores(self.__max_span)
+        return self.__scores
+
+    @property
+    def _matrix(self) -> TriangularMatrix:
+        """
+        Private property, do not use.
+        The (unfilled until _dynamic_prog()) matrix, allocated on first use.
+        """
+        if self.__matrix is None:
+            self.__matrix = TriangularMatrix(
+                self._n, dtype=self._score_dtype(), max_span=self.__max_span
+            )
+        return self.__matrix
+
+    def _pair_scores(self, max_span: Optional[int]) -> TriangularMatrix:
+        """
+        Private method, do not call.
+        Score of every pair (i, j) of the sequence, as a TriangularMatrix with
+        the layout of the matrix. Subclasses may override it to fold with other
+        pair scores, together with self._score_dtype().
+        """
+        return self._scoring.pair_scores(self.sequence, max_span=max_span)
+
+    def _score_dtype(self) -> np.dtype:
+        """
+        Private method, do not call.
+        dtype of the matrix : the narrowest one able to hold the best score.
+        """
+        return self._scoring.score_dtype(self._n)
 
     def _delta(self, i, j) -> int:
         """
         Private method, do not call.
-        Pair score. Defined as :
+        Pair score of bases i and j, read from the precomputed pair scores.
+        With the default ScoringModel, defined as :
         1 if self.sequence[i] is the complement of self.sequence[j]
         0 otherwise
         """
-        return (
-            1 if self.sequence[i] == self._Sequence__complement(self.sequence[j]) else 0
-        )
+        return self._scores[i, j]
 
-    def _dynamic_prog(self) -> np.array:
-        """Get the self-alignment matrix for the given sequence, using dynamic programming.
+    def _scalar_dynamic_prog(self) -> np.array:
+        """Reference implementation of the dynamic programming fill,
+        computing one cell at a time. It is kept to validate
+        self._dynamic_prog(), do not use it on long sequences.
         This method's complexity is :
             O(n^2) in space
             O(n^3) in time
         """
+        _dtype = np.result_type(int, self._scores.dtype)
+        matrix = np.zeros((self._n, self._n), dtype=_dtype)
         for k in range(1, self._n):
-            idx, idy = np.diag_indices_from(self._matrix)
+            idx, idy = np.diag_indices_from(matrix)
             idy = idx.copy()
             idx += k
             _upr = self._n - k
             _r_len = lambda i, j: len(range(i + 1, j))
             _max_k = (
                 lambda i, j: max(
-                    self._matrix[i, m] + self._matrix[m + 1, j] for m in range(i + 1, j)
+                    matrix[i, m] + matrix[m + 1, j] for m in range(i + 1, j)
                 )
                 if _r_len(i, j) > 0
                 else 0
             )
             for j, i in zip(idx[:_upr], idy[:_upr]):
-                self._matrix[i, j] = max(
-                    self._matrix[i + 1, j],
-                    self._matrix[i, j - 1],
-                    self._matrix[i + 1, j - 1] + self._delta(i, j),
+                matrix[i, j] = max(
+                    matrix[i + 1, j],
+                    matrix[i, j - 1],
+                    matrix[i + 1, j - 1] + self._delta(i, j),
                     _max_k(i, j),
                 )
 
+        return matrix
+
+    def _split_scores(self, k: int, rows: slice, first: int, last: int) -> np.ndarray:
+        """
+        Private method, do not call.
+        Max-plus reduction max_t(M[i, i + t] + M[i + t + 1, i + k]), for
+        first <= t <= last, over the cells (i, i + k) of the k-th diagonal
+        whose rows are selected by the slice `rows`.
+
+        Both operands are strided views on the band storage of the matrix,
+        where band[i, d] holds M[i, i + d] and rows have length r :
+            M[i, i + t]          -> band[i, t]
+            M[i + t + 1, i + k]  -> flat index i * r + t * (r - 1) + r + k - 1
+        """
+        band = self._matrix.band
+        flat = band.ravel()
+        r = band.shape[1]
+        item = flat.itemsize
+        start, stop, step = rows.indices(self._n - k)
+        left = band[start:stop:step, first : last + 1]
+        right = as_strided(
+            flat[start * r + first * (r - 1) + r + k - 1 :],
+            shape=left.shape,
+            strides=(step * r * item, (r - 1) * item),
+            writeable=False,
+        )
+        return (left + right).max(axis=1)
+
+    def _bifurcation(
+        self, k: int, start: int = 0, stop: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Private method, do not call.
+        Max-plus reduction max_m(M[i, m] + M[m + 1, j]), for i < m < j,
+        over the cells (i, j = i + k) of the k-th diagonal, for start <= i < stop.
+        Rows are processed by blocks so that temporary arrays never
+        exceed RNAStruct._block_cells elements.
+        """
+        start, stop, _ = slice(start, stop).indices(self._n - k)
+        if k < 2:
+            return np.zeros(stop - start, dtype=self._matrix.dtype)
+
+        block = max(1, self._block_cells // (k - 1))
+        result = np.empty(stop - start, dtype=self._matrix.dtype)
+        for first in range(start, stop, block):
+            rows = slice(first, min(first + block, stop))
+            result[first - start : rows.stop - start] = self._split_scores(
+                k, rows, 1, k - 1
+            )
+
+        return result
+
+    def _fill_diagonal(
+        self, k: int, start: int = 0, stop: Optional[int] = None
+    ) -> None:
+        """
+        Private method, do not call.
+        Compute the cells (i, i + k) of the k-th diagonal, for start <= i < stop,
+        from the previous diagonals, with NumPy operations.
+        """
+        start, stop, _ = slice(start, stop).indices(self._n - k)
+        previous = self._matrix.diagonal(k - 1)
+        # M[i + 1, j - 1] lies on the lower triangle (zeros) when k == 1
+        inner = self._matrix.diagonal(k - 2)[start + 1 : stop + 1] if k > 1 else 0
+        self._matrix.diagonal(k)[start:stop] = np.maximum.reduce(
+            [
+                previous[start + 1 : stop + 1],
+                previous[start:stop],
+                inner + self._scores.diagonal(k)[start:stop],
+                self._bifurcation(k, start, stop),
+            ]
+        )
+
+    def _dense_fill(self) -> None:
+        """
+        Private method, do not call.
+        Fill the matrix diagonal by diagonal, each diagonal being computed
+        as a whole, with NumPy operations.
+        """
+        for k in range(1, self._matrix.max_span + 1):
+            self._fill_diagonal(k)
+
+    def _sparse_fill(self) -> None:
+        """
+        Private method, do not call.
+        Fill the matrix with the sparsified recurrence, where j is either
+        unpaired or paired with some q >= i :
+
+            M[i, j] = max(M[i, j - 1], max_q M[i, q - 1] + L[q, j])
+            L[q, j] = delta(q, j) + M[q + 1, j - 1]
+
+        Only candidate pairs (q, j) are kept in the inner max : those whose
+        closed structure L[q, j] beats every decomposition of [q, j] into
+        two parts, i.e. the value M[q, j] would have without that pair.
+        Any other pair is matched by a decomposition going through candidates
+        only, so the matrix is exactly the one of self._dense_fill(), but each
+        cell only visits the candidates of its column instead of all splits.
+
+        Candidates are kept sorted by their closing base j, so that those
+        relevant to a diagonal form a contiguous suffix.
+        """
+        band = self._matrix.band
+        closing = np.empty(0, dtype=np.intp)
+        opening = np.empty(0, dtype=np.intp)
+        closed = np.empty(0, dtype=self._matrix.dtype)
+
+        for k in range(1, self._matrix.max_span + 1):
+            _upr = self._n - k
+            best = self._matrix.diagonal(k - 1)[:_upr].copy()  # M[i, j - 1]
+
+            first = np.searchsorted(closing, k)
+            if first < len(closing):
+                j, q = closing[first:], opening[first:]
+                i = j - k
+                values = band[i, q - 1 - i] + closed[first:]
+                starts = np.flatnonzero(np.r_[True, j[1:] != j[:-1]])
+                rows = i[starts]
+                best[rows] = np.maximum(best[rows], np.maximum.reduceat(values, starts))
+
+            pair = self._scores.diagonal(k)
+            inner = self._matrix.diagonal(k - 2)[1 : _upr + 1] if k > 1 else 0
+            enclosed = pair + inner
+            candidates = np.flatnonzero((pair > 0) & (enclosed > best))
+            self._matrix.diagonal(k)[:] = np.where(
+                pair > 0, np.maximum(best, enclosed), best
+            )
+
+            if candidates.size:
+                position = np.searchsorted(closing, candidates + k, side="right")
+                closing = np.insert(closing, position, candidates + k)
+                opening = np.insert(opening, position, candidates)
+                closed = np.insert(closed, position, enclosed[candidates])
+
+    @staticmethod
+    def _russians_table(q: int) -> np.ndarray:
+        """
+        Private method, do not call.
+        Lookup table of the Four-Russians backend, for blocks of q positions.
+        A block of a row is described by the q - 1 differences between its
+        consecutive entries, and a block of a column likewise, each one being
+        0 or 1 and packed into the bits of an integer. Entry (a, b) holds
+            max_t(prefix(a, t) + suffix(b, t)),  0 <= t < q
+        where prefix(a, t) is the sum of the first t bits of a and suffix(b, t)
+        the sum of bits t to q - 2 of b.
+        """
+        codes = np.arange(1 << (q - 1))
+        bits = (codes[:, np.newaxis] >> np.arange(q - 1)) & 1
+        zeros = np.zeros((len(codes), 1), dtype=int)
+        prefix = np.hstack([zeros, np.cumsum(bits, axis=1)])
+        suffix = np.hstack([np.cumsum(bits[:, ::-1], axis=1)[:, ::-1], zeros])
+        return (prefix[:, np.newaxis, :] + suffix[np.newaxis, :, :]).max(axis=2)
+
+    def _four_russians_fill(self) -> None:
+        """
+        Private method, do not call.
+        Fill the matrix diagonal by diagonal, computing the bifurcation term
+        with the Four-Russians speedup (Frid & Gusfield). When every allowed
+        pair scores 1, consecutive cells of a row or column of the matrix
+        differ by 0 or 1. Splits m are grouped in blocks [g * q, g * q + q) :
+
+            max_m M[i, m] + M[m + 1, j]
+                = M[i, g * q] + M[g * q + q, j] + T[row bits, column bits]
+
+        for every block lying between i and j, where T is the lookup table of
+        self._russians_table() and the bits encode the block of row i and the
+        block of column j. Only splits outside of complete blocks are scanned
+        directly, which brings the time complexity to O(n^3 / q), i.e.
+        O(n^3 / log n) with q = log2(n) / 2.
+
+        Rows i are processed by classes of equal i % q : within a class, the
+        first complete block is (i // q + 1), so both encodings are read
+        through regular strides. They are kept relative to their row / column
+        to only use O(n * max_span / q) memory.
+        """
+        n, span = self._n, self._matrix.max_span
+        q = self._russians_block or max(2, int(np.ceil(np.log2(max(n, 2)) / 2)))
+        band = self._matrix.band
+        flat = band.ravel()
+        item = flat.itemsize
+        table = self._russians_table(q).astype(band.dtype).ravel()
+        weights = 1 << np.arange(q - 1)
+        code_dtype = smallest_int_dtype(len(table) - 1)
+
+        # row_*[i, t] : block i // q + 1 + t of row i
+        row_base = np.zeros((n, span // q + 1), dtype=band.dtype)
+        row_bits = np.zeros((n, span // q + 1), dtype=code_dtype)
+        # col_*[j, c] : block j // q - c of column j
+        col_base = np.zeros((n, span // q + 2), dtype=band.dtype)
+        col_bits = np.zeros((n, span // q + 2), dtype=code_dtype)
+
+        for k in range(1, span + 1):
+            _upr = n - k
+            bifurcation = np.zeros(_upr, dtype=band.dtype)
+            # no split m can lie strictly between i and j on the first diagonal
+            for res in range(min(q, _upr) if k > 1 else 0):
+                rows = slice(res, _upr, q)
+                # number of complete blocks between i and j
+                blocks = (res + k) // q - 1
+                if blocks <= 0:
+                    bifurcation[rows] = self._split_scores(k, rows, 1, k - 1)
+                    continue
+
+                best = bifurcation[rows]
+                if q - res - 1 >= 1:
+                    best = np.maximum(best, self._split_scores(k, rows, 1, q - res - 1))
+                if (blocks + 1) * q - res <= k - 1:
+                    right = self._split_scores(k, rows, (blocks + 1) * q - res, k - 1)
+                    best = np.maximum(best, right)
+
+                # column j = i + k, blocks i // q + 1 ... i // q + blocks
+                last = (res + k) // q - 1
+                columns = (slice(res + k, n, q), slice(last - blocks + 1, last + 1))
+                base = row_base[rows][:, :blocks] + col_base[columns][:, ::-1]
+                codes = row_bits[rows][:, :blocks] + col_bits[columns][:, ::-1]
+                bifurcation[rows] = np.maximum(best, (base + table[codes]).max(axis=1))
+
+            previous = self._matrix.diagonal(k - 1)
+            inner = self._matrix.diagonal(k - 2)[1 : _upr + 1] if k > 1 else 0
+            self._matrix.diagonal(k)[:] = np.maximum.reduce(
+                [
+                    previous[1 : _upr + 1],
+                    previous[:_upr],
+                    inner + self._scores.diagonal(k),
+                    bifurcation,
+                ]
+            )
+
+            # rows whose block ending on this diagonal is complete
+            if k >= q:
+                res = (-k - 1) % q
+                values = band[res:_upr:q, k + 1 - q : k + 1]
+                t = (res + k + 1) // q - 2
+                row_base[res:_upr:q, t] = values[:, 0]
+                row_bits[res:_upr:q, t] = (np.diff(values, axis=1) @ weights) << (q - 1)
+
+            # columns j = g * q + k + 1 whose block g is now complete
+            if k + 1 >= q and n - k - 2 >= 0:
+                values = as_strided(
+                    flat[band.shape[1] + k :],
+                    shape=((n - k - 2) // q + 1, q),
+                    strides=(q * band.shape[1] * item, (band.shape[1] - 1) * item),
+                    writeable=False,
+                )
+                c = (k + 1) // q
+                col_base[k + 1 :: q, c] = values[:, q - 1]
+                col_bits[k + 1 :: q, c] = (values[:, :-1] - values[:, 1:]) @ weights
+
+    def _dynamic_prog(self) -> TriangularMatrix:
+        """Get the self-alignment matrix for the given sequence, using dynamic programming.
+        The matrix is filled only once, by the selected backend, and reused
+        afterwards.
+        Only the upper triangle is stored, using the narrowest integer dtype
+        able to hold the maximal score (see TriangularMatrix).
+        This method's complexity is :
+            O(n^2) in space, O(n * max_span) in banded mode
+            O(n^3) in time, O(n * max_span^2) in banded mode
+        """
+        if self._filled:
+            return self._matrix
+
+        getattr(self, self._backends[self._backend])()
+        self._filled = True
         return self._matrix
 
+    @property
+    def max_span(self) -> int:
+        """ Largest j - i of the base pairs (i, j) considered by the fold."""
+        # as TriangularMatrix.max_span, without allocating the matrix
+        if self.__max_span is None:
+            return max(self._n - 1, 0)
+        return max(min(self._n, self.__max_span + 1) - 1, 0)
+
+    def _prefix_scores(self) -> np.ndarray:
+        """
+        Private method, do not call.
+        Best scores of the prefixes of the sequence : entry j holds the maximum
+        number of pairs in sequence[:j], when the structure is decomposed into
+        consecutive components (i, j) of span at most max_span, each one scored
+        by the matrix. Without max_span, the last entry is simply M[0, n - 1].
+        """
+        if self._prefix is not None:
+            return self._prefix
+
+        band = self._dynamic_prog().band
+        prefix = np.zeros(self._n + 1, dtype=self._matrix.dtype)
+        for j in range(self._n):
+            i = np.arange(max(0, j - self.max_span), j + 1)
+            prefix[j + 1] = max(prefix[j], (prefix[i] + band[i, j - i]).max())
+
+        self._prefix = prefix
+        return prefix
+
+    def _suffix_scores(self) -> np.ndarray:
+        """
+        Private method, do not call.
+        Best scores of the suffixes of the sequence : entry i holds the maximum
+        score of sequence[i:], the counterpart of self._prefix_scores().
+        """
+        if self._suffix is not None:
+            return self._suffix
+
+        band = self._dynamic_prog().band
+        suffix = np.zeros(self._n + 1, dtype=self._matrix.dtype)
+        for i in range(self._n - 1, -1, -1):
+            _len = min(self.max_span + 1, self._n - i)
+            suffix[i] = max(
+                suffix[i + 1], (band[i, :_len] + suffix[i + 1 : i + 1 + _len]).max()
+            )
+
+        self._suffix = suffix
+        return suffix
+
+    def _padded(self, band: np.ndarray, fill) -> np.ndarray:
+        """
+        Private method, do not call.
+        Copy of a band array, with max_span rows of `fill` on top and one at
+        the bottom, so that strided views may step out of the sequence.
+        """
+        padded = np.full(
+            (self.max_span + self._n + 1, band.shape[1]), fill, dtype=self._wide_dtype
+        )
+        padded[self.max_span : self.max_span + self._n] = band
+        return padded
+
+    @property
+    def _wide_dtype(self) -> np.dtype:
+        """ Private property. Signed dtype holding scores and the sentinel below."""
+        return np.result_type(self._score_dtype(), np.int64)
+
+    @property
+    def _sentinel(self):
+        """ Private property. Score of impossible configurations."""
+        if np.issubdtype(self._wide_dtype, np.floating):
+            return -np.inf
+        return np.iinfo(self._wide_dtype).min // 4
+
+    def _outside_scores(self) -> np.ndarray:
+        """
+        Private method, do not call.
+        Outside scores of the cells of the matrix : O[i, j] is the best score of
+        the bases outside of [i, j], over the structures where [i, j] is a unit,
+        i.e. where no pair links a base of [i, j] to a base outside of it.
+        The best structure containing the pair (i, j) thus scores
+            O[i, j] + delta(i, j) + M[i + 1, j - 1]
+
+        Spans are processed in decreasing order, a unit (i, j) being either a
+        top-level component, enclosed by the pair (i - 1, j + 1), or the right
+        (left) part of a larger unit (a, j) ((i, b)) :
+
+            O[i, j] = max(F[i] + G[j + 1],
+                          O[i - 1, j + 1] + delta(i - 1, j + 1),
+                          max_a O[a, j] + M[a, i - 1],
+                          max_b O[i, b] + M[j + 1, b])
+
+        where F and G are the prefix and suffix scores. Like the matrix, this
+        costs O(n * max_span^2) time. The result is returned as a band padded
+        by self._padded() : row max_span + i holds the cells (i, i + k), and
+        the padding holds a sentinel, so that every term is a strided view.
+        """
+        if self._outside is not None:
+            return self._outside
+
+        n, w = self._n, self.max_span
+        prefix, suffix = self._prefix_scores(), self._suffix_scores()
+        matrix = self._padded(self._matrix.band, 0)
+        scores = self._padded(self._scores.band, 0)
+        outside = np.full_like(matrix, self._sentinel)
+        r, item = outside.shape[1], outside.itemsize
+
+        for k in range(w, -1, -1):
+            _upr = n - k
+            rows = slice(w, w + _upr)
+            terms = [prefix[:_upr] + suffix[k + 1 :].astype(self._wide_dtype)]
+            if k + 2 <= w:
+                enclosing = slice(w - 1, w - 1 + _upr)
+                terms.append(outside[enclosing, k + 2] + scores[enclosing, k + 2])
+            s = w - k
+            if s >= 1:
+                # right parts, with b = i + k + t for 1 <= t <= s
+                right = matrix[w + k + 1 : w + k + 1 + _upr, :s]
+                terms.append((outside[rows, k + 1 :] + right).max(axis=1))
+                # left parts, with a = i - t for t = s, s - 1, ..., 1
+                left_outside = as_strided(
+                    outside.ravel()[w * r + k - s * (r - 1) :],
+                    shape=(_upr, s),
+                    strides=(r * item, (r - 1) * item),
+                    writeable=False,
+                )
+                left_matrix = as_strided(
+                    matrix.ravel()[w * r - s * (r - 1) - 1 :],
+                    shape=(_upr, s),
+                    strides=(r * item, (r - 1) * item),
+                    writeable=False,
+                )
+                terms.append((left_outside + left_matrix).max(axis=1))
+            outside[rows, k] = np.maximum.reduce(terms)
+
+        self._outside = outside
+        return outside
+
     @property
     def max_n_pairs(self) -> int:
         """Return the max number of aligned paris in a secondary structure
         determined by the maximum entry of the dynamic programming matrix
-        calculated on the sequence."""
-        return self._dynamic_prog().max()
\ No newline at end of file
+        calculated on the sequence. In banded mode, this is the best
+        combination of components of span at most max_span. The score is
+        widened from the dtype of the matrix (see self._wide_dtype), so that
+        it can be summed or multiplied without overflowing."""
+        if self._cache is not None or self._score is not None:
+            return self._wide_dtype.type(self._cached_fold())
+        return self._wide_dtype.type(self._prefix_scores()[-1])
+
+    def _cached_fold(self):
+        """
+        Private method, do not call.
+        Look the fold up in self._cache, folding the sequence and storing its
+        score and pair table on a miss. Return the score, self._pairs is set.
+        A score already known (e.g. loaded from a binary file) is returned.
+        """
+        if self._score is None:
+            key = self._cache.key(self.sequence, self.max_span, self._scoring)
+            entry = self._cache.get(key)
+            if entry is None:
+                pairs = self._traceback(*self._components())
+                entry = (self._prefix_scores()[-1], pairs)
+                self._cache.put(key, *entry)
+            score, pairs = entry
+            self._score = self._score_dtype().type(score)
+            self._pairs = np.array(pairs, dtype=int)
+        return self._score
+
+    def _components(self) -> List[Tuple[int, int]]:
+        """
+        Private method, do not call.
+        Intervals (i, j) of the top-level components of an optimal structure,
+        recovered from the prefix scores and sorted by position.
+        """
+        matrix = self._dynamic_prog()
+        prefix = self._prefix_scores()
+        components: List[Tuple[int, int]] = []
+        j = self._n
+        while j > 0:
+            if prefix[j] == prefix[j - 1]:
+                j -= 1
+                continue
+            starts = np.arange(max(0, j - 1 - self.max_span), j)
+            scores = prefix[starts] + matrix[starts[0] : j, j - 1]
+            i = int(starts[np.flatnonzero(scores == prefix[j])[0]])
+            components.append((i, j - 1))
+            j = i
+
+        return components[::-1]
+
+    def _traceback(self, *intervals: Tuple[int, int]) -> np.ndarray:
+        """
+        Private method, do not call.
+        Recover the optimal structure of the given intervals from the filled
+        matrix, using an explicit stack of (i, j) intervals instead of recursion.
+        Each interval is resolved in O(1) unless it is a bifurcation, which costs
+        O(j - i), so the traceback runs between O(n) and O(n^2) time.
+        """
+        matrix = self._dynamic_prog()
+        pairs = np.full(self._n, -1, dtype=int)
+        stack: Stack = Stack()
+        stack.push(*intervals)
+
+        while not stack.is_empty():
+            i, j = stack.pop()
+            if i >= j:
+                continue
+            score, pair = matrix[i, j], self._delta(i, j)
+            if score == 0:
+                continue
+            elif score == matrix[i + 1, j]:
+                stack.push((i + 1, j))
+            elif score == matrix[i, j - 1]:
+                stack.push((i, j - 1))
+            elif pair and score == matrix[i + 1, j - 1] + pair:
+                pairs[i], pairs[j] = j, i
+                stack.push((i + 1, j - 1))
+            else:
+                split = matrix[i, i + 1 : j] + matrix[i + 2 : j + 1, j]
+                m = i + 1 + int(np.flatnonzero(split == score)[0])
+                stack.push((m + 1, j), (i, m))
+
+        return pairs
+
+    @staticmethod
+    def _render(pairs: np.ndarray) -> str:
+        """
+        Private method, do not call.
+        Convert a pair table to a parenthesised expression.
+        """
+        positions = np.arange(len(pairs))
+        chars = np.full(len(pairs), "-")
+        chars[pairs > positions] = "("
+        chars[(pairs >= 0) & (pairs < positions)] = ")"
+        return "".join(chars)
+
+    def pair_table(self) -> np.ndarray:
+        """Return the pair table of an optimal secondary structure :
+        an integer array where entry i holds the index of the base paired
+        with i, or -1 if base i is unpaired."""
+        if self._pairs is None and self._cache is not None:
+            self._cached_fold()
+        if self._pairs is None:
+            self._pairs = self._traceback(*self._components())
+        return self._pairs.copy()
+
+    def to_parentheses(self) -> str:
+        """Return an optimal secondary structure as a parenthesised expression,
+        using "-" for unpaired bases, as expected by
+        Tree.from_parentheses_and_sequence()"""
+        return self._render(self.pair_table())
+
+    def to_tree(self) -> Tree:
+        """ Build the Tree of an optimal secondary structure of the sequence."""
+        return Tree.from_parentheses_and_sequence(self.to_parentheses(), self.sequence)
+
+    def _window(self, start: int, stop: int) -> "RNAStruct":
+        """
+        Private method, do not call.
+        Fold of self.sequence[start:stop], with the same parameters.
+        """
+        sequence = self.sequence[start:stop]
+        return RNAStruct(sequence, self.max_span or None, self._scoring, self._backend)
+
+    def local_structures(
+        self, window: Optional[int] = None
+    ) -> Iterator[Tuple[int, int, str]]:
+        """Sliding-window local scan : fold the sequence one window of `window`
+        bases at a time (4 * (max_span + 1) by default), from left to right,
+        yielding the locally optimal substructures found in each window as
+        tuples (start, end, parentheses) where parentheses describes
+        self.sequence[start : end + 1].
+
+        Consecutive windows overlap by max_span bases, so that every
+        substructure starting in the part of a window not covered by the
+        next one lies entirely within it ; those are yielded, in order and
+        without overlapping the previous ones, before the next window is
+        folded. Only one window is held in memory, and the matrix of self
+        is never filled : this is the way to scan a genome. Without max_span,
+        the default window is the whole sequence.
+        """
+        span = self.max_span
+        window = window or 4 * (span + 1)
+        if window <= span:
+            raise ValueError(f"window should be larger than max_span, not {window}")
+        step, previous_end = window - span, -1
+        for start in range(0, max(self._n - span, 1), step):
+            last = start + window >= self._n
+            fold = self._window(start, start + window)
+            for i, j in fold._components():
+                if i + start <= previous_end or not (last or i < step):
+                    continue
+                pairs = fold._traceback((i, j))[i : j + 1]
+                yield i + start, j + start, self._render(
+                    np.where(pairs >= 0, pairs - i, -1)
+                )
+                previous_end = j + start
+            if last:
+                break
+
+    def mutate(self, position: int, base: str) -> "RNAStruct":
+        """Return the RNAStruct of the sequence where the base at `position` is
+        substituted by `base`, with the same parameters. Its matrix is filled
+        incrementally : only the cells (i, j) with i <= position <= j can
+        change, every other cell is copied from the matrix of self."""
+        if not 0 <= position < self._n:
+            raise IndexError(f"position {position} is out of the sequence")
+        if not (isinstance(base, str) and len(base) == 1):
+            raise ValueError(f"base should be a single character, not {base!r}")
+
+        self._dynamic_prog()
+        sequence = self.sequence[:position] + base + self.sequence[position + 1 :]
+        mutant = RNAStruct(
+            sequence, self.max_span or None, self._scoring, self._backend, self._cache
+        )
+        mutant._matrix.band[:] = self._matrix.band
+        for k in range(1, self.max_span + 1):
+            mutant._fill_diagonal(k, position - k if position > k else 0, position + 1)
+        mutant._filled = True
+        return mutant
+
+    def mutation_scan(self) -> np.ndarray:
+        """Return the best score of every single-base substitution of the sequence,
+        as an array of shape (n, 4) with the dtype of max_n_pairs : entry (k, b) is
+        the max_n_pairs of the sequence where base k is replaced by
+        ScoringModel.alphabet[b]. Entries of the original bases hold self.max_n_pairs.
+
+        A substitution at k only changes the scores of the pairs involving k, so
+        the best mutant structure either leaves k unpaired, or pairs it with some
+        base x, and both cases are read from the matrix and its outside scores
+        (see self._outside_scores()) in O(max_span) per position. The whole scan
+        costs about two folds, instead of 3n independent ones.
+        """
+        n, w = self._n, self.max_span
+        alphabet = ScoringModel.alphabet
+        if n == 0 or w == 0:
+            # no pair fits in the sequence, whatever its bases
+            return np.zeros((n, len(alphabet)), dtype=self._wide_dtype)
+
+        outside = self._outside_scores()
+        matrix = self._padded(self._matrix.band, 0)
+        r, item = outside.shape[1], outside.itemsize
+        table = self._scoring.table
+        codes = self._scoring.encode(self.sequence)
+        unknown = np.full(w, len(alphabet), dtype=codes.dtype)
+
+        # k unpaired : best over the units (k, b) of O[k, b] + M[k + 1, b]
+        unpaired = np.maximum(
+            outside[w : w + n, 0],
+            (outside[w : w + n, 1:] + matrix[w + 1 : w + n + 1, :w]).max(axis=1),
+        )
+
+        # pairs (k, k + t), for t = 1 ... w
+        right = outside[w : w + n, 1:] + np.hstack(
+            [np.zeros((n, 1), dtype=matrix.dtype), matrix[w + 1 : w + n + 1, : w - 1]]
+        )
+        right_codes = sliding_window_view(np.concatenate([codes, unknown]), w + 1)
+        right_codes = right_codes[:n, 1:]
+
+        # pairs (k - t, k), for t = w ... 1
+        left = as_strided(
+            outside.ravel()[w:], shape=(n, w), strides=(r * item, (r - 1) * item)
+        ) + as_strided(
+            matrix.ravel()[(w + 1) * r - w * (r - 1) - 2 :],
+            shape=(n, w),
+            strides=(r * item, (r - 1) * item),
+        )
+        left[:, -1] = outside[w - 1 : w - 1 + n, 1]
+        left_codes = sliding_window_view(np.concatenate([unknown, codes]), w)[:n]
+
+        # pairs enclosing less than min_loop bases score zero
+        allowed = np.arange(1, w + 1) > self._scoring.min_loop
+        result = np.empty((n, len(alphabet)), dtype=self._wide_dtype)
+        for b in range(len(alphabet)):
+            gain_right = np.where(allowed, table[b][right_codes], 0)
+            gain_left = np.where(allowed[::-1], table[:, b][left_codes], 0)
+            result[:, b] = np.maximum.reduce(
+                [
+                    unpaired,
+                    (right + gain_right).max(axis=1, initial=self._sentinel),
+                    (left + gain_left).max(axis=1, initial=self._sentinel),
+                ]
+            )
+
+        return result
@@ -1,4 +1,8 @@
+from string import ascii_uppercase
 from typing import Dict
+
+import numpy as np
+
 from .datastructures import Stack
 
 
@@ -76,6 +80,44 @@ def validate_and_convert(expr: str) -> str:
         else:
             return Parentheses.to_parentheses(expr)
 
+    @staticmethod
+    def pair_table(expr: str, pseudoknots: bool = False) -> np.ndarray:
+        """
+        Parse a bracket expression, such as a WUSS consensus structure
+        (#=GC SS_cons of Stockholm files), into a pair table : an integer
+        array where entry i holds the index paired with i, or -1.
+
+        Every kind of bracket { "<", "(", "[", "{" } has its own Stack,
+        all other characters are unpaired positions. In WUSS notation,
+        pseudoknotted pairs are written as an upper case letter closed by
+        the same letter in lower case (e.g. "A" ... "a") : they are only
+        included when `pseudoknots` is True.
+        """
+        if not isinstance(expr, str):
+            raise TypeError(f"parameter `expr` should be a String, not {type(expr)}")
+
+        closing: Dict[str, str] = {
+            close: open for open, close in Parentheses._token_pairs.items()
+        }
+        if pseudoknots:
+            closing.update((letter.lower(), letter) for letter in ascii_uppercase)
+        stacks: Dict[str, Stack] = {open: Stack() for open in closing.values()}
+
+        pairs = np.full(len(expr), -1, dtype=int)
+        for i, char in enumerate(expr):
+            if char in stacks:
+                stacks[char].push(i)
+            elif char in closing:
+                try:
+                    j = stacks[closing[char]].pop()
+                except IndexError:
+                    raise ValueError(f"Unbalanced {char!r} at position {i}") from None
+                pairs[i], pairs[j] = j, i
+        if not all(stack.is_empty() for stack in stacks.values()):
+            raise ValueError("Parenthesised expression is not balanced")
+
+        return pairs
+
     def __init__(self, expression: str):
         raise NotImplementedError(
             "This class was not meant to be instantiated. Use Parentheses.validate_and_convert() instead"
@@ -0,0 +1,162 @@
+"""
+    Base-pair scoring models used by the dynamic programming
+    algorithms on RNA sequences.
+"""
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .triangular import TriangularMatrix, smallest_int_dtype
+
+__all__ = ["ScoringModel"]
+
+
+class ScoringModel(object):
+    """
+    Score of each possible base pair, used to fill the matrices of RNAStruct.
+
+    Parameters :
+        weights  : score of pairs, given as two-letter strings, e.g.
+                   {"GC": 3, "CG": 3, "AU": 2, "UA": 2}. Every Watson-Crick
+                   pair scores 1 unless given here, a weight of 0 forbids
+                   the pair.
+        wobble   : should G-U pairs be allowed ? They score 1 unless
+                   "GU" and "UG" are given in `weights`.
+        min_loop : minimum number of unpaired bases enclosed by a pair,
+                   i.e. (i, j) may only pair if j - i > min_loop.
+
+    The default model reproduces the original behaviour of RNAStruct :
+    one point per Watson-Crick pair, no minimum loop length.
+
+    Bases are encoded as small integers (see ScoringModel.encode())
+    so that the scores of a whole sequence are computed at once,
+    by indexing the score table with the encoded sequence.
+    """
+
+    alphabet: str = "ACGU"
+
+    __watson_crick: Dict[str, int] = {"AU": 1, "UA": 1, "CG": 1, "GC": 1}
+
+    __wobble: Dict[str, int] = {"GU": 1, "UG": 1}
+
+    __codes: np.ndarray = np.full(256, 4, dtype=np.uint8)
+    __codes[np.frombuffer(b"ACGUacgu", dtype=np.uint8)] = [0, 1, 2, 3, 0, 1, 2, 3]
+
+    @staticmethod
+    def encode(sequence: str) -> np.ndarray:
+        """Encode a sequence as an array of uint8 codes, A -> 0, C -> 1,
+        G -> 2, U -> 3. Any other character is encoded as 4."""
+        raw = np.frombuffer(sequence.encode("ascii", errors="replace"), dtype=np.uint8)
+        return ScoringModel.__codes[raw]
+
+    def __init__(
+        self,
+        weights: Optional[Dict[str, Union[int, float]]] = None,
+        wobble: bool = False,
+        min_loop: int = 0,
+    ):
+        _weights: Dict[str, Union[int, float]] = dict(self.__watson_crick)
+        if wobble:
+            _weights.update(self.__wobble)
+        for pair, weight in (weights or {}).items():
+            if len(pair) != 2 or not set(pair.upper()).issubset(self.alphabet):
+                raise ValueError(f"Invalid base pair {pair!r} in scoring weights")
+            if weight < 0:
+                raise ValueError(f"Pair {pair!r} has a negative weight {weight}")
+            # keys are case-insensitive : "au" overrides (or forbids) "AU"
+            _weights[pair.upper()] = weight
+        if min_loop < 0:
+            raise ValueError(f"min_loop should be non-negative, not {min_loop}")
+
+        self._weights: Dict[str, Union[int, float]] = {
+            pair: weight for pair, weight in _weights.items() if weight
+        }
+        self._min_loop: int = int(min_loop)
+
+        _integral = all(float(w).is_integer() for w in self._weights.values())
+        # one extra row and column : scores involving unknown bases are zero
+        self._table: np.ndarray = np.zeros(
+            (len(self.alphabet) + 1,) * 2,
+            dtype=smallest_int_dtype(self.max_weight) if _integral else np.float64,
+        )
+        for pair, weight in self._weights.items():
+            self._table[self.alphabet.index(pair[0]), self.alphabet.index(pair[1])] = (
+                weight
+            )
+
+    def __repr__(self):
+        return f"ScoringModel(weights={self._weights}, min_loop={self._min_loop})"
+
+    def __eq__(self, other):
+        if not isinstance(other, ScoringModel):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    @property
+    def key(self) -> Tuple:
+        """ A hashable description of the parameters of the model."""
+        return (tuple(sorted(self._weights.items())), self._min_loop)
+
+    @property
+    def weights(self) -> Dict[str, Union[int, float]]:
+        """ Shallow copy of the (non-zero) weight of each pair."""
+        return self._weights.copy()
+
+    @property
+    def min_loop(self) -> int:
+        return self._min_loop
+
+    @property
+    def table(self) -> np.ndarray:
+        """Score of each pair of encoded bases, the last row and
+        column correspond to unknown bases."""
+        return self._table.copy()
+
+    @property
+    def max_weight(self) -> Union[int, float]:
+        """ Largest score of a single pair."""
+        return max(self._weights.values(), default=0)
+
+    def score_dtype(self, n: int) -> np.dtype:
+        """Narrowest dtype able to hold the score of any structure
+        on a sequence of length n."""
+        if np.issubdtype(self._table.dtype, np.floating):
+            return self._table.dtype
+        return smallest_int_dtype(int(self.max_weight) * (n // 2))
+
+    def pair_matrix(self, sequence: Union[str, np.ndarray]) -> np.ndarray:
+        """Dense n x n matrix of the pair scores of a sequence (or of its
+        encoded form), computed by broadcasting the encoded sequence
+        against itself. Entry (i, j) is zero unless j - i > min_loop."""
+        codes = self.encode(sequence) if isinstance(sequence, str) else sequence
+        return np.triu(
+            self._table[codes[:, np.newaxis], codes[np.newaxis, :]], self._min_loop + 1
+        )
+
+    def pair_scores(
+        self, sequence: Union[str, np.ndarray], max_span: Optional[int] = None
+    ) -> TriangularMatrix:
+        """Pair scores of a sequence (or of its encoded form), stored as a
+        TriangularMatrix with the same layout as the matrix of RNAStruct :
+        band[i, k] holds the score of the pair (i, i + k). Each row of the
+        band is computed by broadcasting over a sliding window of the
+        encoded sequence, so that only O(n * max_span) cells are allocated."""
+        codes = self.encode(sequence) if isinstance(sequence, str) else sequence
+        n = len(codes)
+        scores = TriangularMatrix(n, dtype=self._table.dtype, max_span=max_span)
+        width = scores.band.shape[1]
+        if n == 0:
+            return scores
+
+        # pad with unknown bases (zero score) past the end of the sequence
+        padded = np.concatenate(
+            [codes, np.full(width - 1, len(self.alphabet), dtype=codes.dtype)]
+        )
+        windows = sliding_window_view(padded, width)
+        scores.band[:] = self._table[codes[:, np.newaxis], windows]
+        scores.band[:, : self._min_loop + 1] = 0
+        return scores
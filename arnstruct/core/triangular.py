@@ -0,0 +1,148 @@
+"""
+    Compact storage for the upper-triangular matrices
+    filled by dynamic programming on RNA sequences.
+"""
+from typing import Any, Optional, Tuple, Union
+
+import numpy as np
+
+__all__ = ["TriangularMatrix", "smallest_int_dtype"]
+
+
+def smallest_int_dtype(bound: int) -> np.dtype:
+    """ Return the narrowest signed integer dtype able to hold `bound`."""
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        if np.iinfo(dtype).max >= bound:
+            return np.dtype(dtype)
+    raise OverflowError(f"No integer dtype can hold the value {bound}")
+
+
+class TriangularMatrix(object):
+    """
+    Upper-triangular n x n matrix, stored by diagonal offsets.
+
+    Cell (i, j), for j >= i, is kept in a 2-D array `band` at position
+    (i, j - i), so that row i of the band holds M[i, i], M[i, i + 1], ...
+    and each diagonal of the matrix is a column of the band. This layout
+    keeps every diagonal, and the operands of the Nussinov recurrence,
+    reachable through strided views.
+
+    Matrix-style indexing is supported for integers and slices :
+
+    >>> matrix[i, j]           # a scalar
+    >>> matrix[i, i + 1 : j]   # part of row i
+    >>> matrix[i + 2 : j, j]   # part of column j
+
+    Cells below the main diagonal are never stored and read as zero.
+    np.asarray(matrix) returns the equivalent dense n x n array.
+
+    When `max_span` is given, only the cells with j - i <= max_span
+    are stored (O(n * max_span) memory), the other ones read as zero.
+    """
+
+    def __init__(self, n: int, dtype: Any = np.int64, max_span: Optional[int] = None):
+        if max_span is not None and max_span < 0:
+            raise ValueError(
+                f"max_span should be a non-negative integer, not {max_span}"
+            )
+        self._n: int = n
+        _width: int = n if max_span is None else min(n, max_span + 1)
+        self._band: np.ndarray = np.zeros((n, _width), dtype=dtype)
+
+    def __repr__(self):
+        return (
+            f"TriangularMatrix(n={self._n}, dtype={self.dtype}, "
+            f"max_span={self.max_span})"
+        )
+
+    def __len__(self):
+        return self._n
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        return dense if dtype is None else dense.astype(dtype)
+
+    @staticmethod
+    def _as_indices(key: Union[int, slice], n: int) -> np.ndarray:
+        """ Private method, do not call. Convert an int or slice to an index array."""
+        if isinstance(key, slice):
+            return np.arange(*key.indices(n))
+        key = int(key)
+        if not -n <= key < n:
+            raise IndexError(f"index {key} is out of bounds for size {n}")
+        return np.array([key % n])
+
+    def __getitem__(self, key: Tuple[Union[int, slice], Union[int, slice]]):
+        if not (isinstance(key, tuple) and len(key) == 2):
+            raise IndexError("TriangularMatrix expects a pair of indices (i, j)")
+        rows, cols = (self._as_indices(k, self._n) for k in key)
+        rows, cols = np.ix_(rows, cols)
+        offsets = cols - rows
+        stored = (offsets >= 0) & (offsets < self._band.shape[1])
+        values = np.zeros(offsets.shape, dtype=self.dtype)
+        rows = np.broadcast_to(rows, offsets.shape)
+        values[stored] = self._band[rows[stored], offsets[stored]]
+
+        if isinstance(key[0], slice) and isinstance(key[1], slice):
+            return values
+        elif isinstance(key[0], slice):
+            return values[:, 0]
+        elif isinstance(key[1], slice):
+            return values[0, :]
+        else:
+            return values[0, 0]
+
+    def __setitem__(self, key: Tuple[int, int], value: Any):
+        i, j = key
+        if not 0 <= i <= j < self._n:
+            raise IndexError(f"cell ({i}, {j}) is out of bounds for size {self._n}")
+        if not j - i < self._band.shape[1]:
+            raise IndexError(f"cell ({i}, {j}) is not stored in the matrix")
+        self._band[i, j - i] = value
+
+    @property
+    def n(self) -> int:
+        """ Size of the (square) matrix."""
+        return self._n
+
+    @property
+    def max_span(self) -> int:
+        """ Largest j - i of the stored cells."""
+        return max(self._band.shape[1] - 1, 0)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (self._n, self._n)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._band.dtype
+
+    @property
+    def nbytes(self) -> int:
+        """ Memory used by the stored cells, in bytes."""
+        return self._band.nbytes
+
+    @property
+    def band(self) -> np.ndarray:
+        """Underlying storage, where band[i, k] holds the matrix cell (i, i + k).
+        Entries with i + k >= n are padding and must be ignored."""
+        return self._band
+
+    def diagonal(self, k: int) -> np.ndarray:
+        """Writable view on the cells (i, i + k) of the k-th diagonal.
+        Raises IndexError if the diagonal lies outside of the stored band."""
+        if not 0 <= k < self._band.shape[1]:
+            raise IndexError(f"diagonal {k} is not stored in the matrix")
+        return self._band[: self._n - k, k]
+
+    def max(self):
+        """ Maximum over the stored cells."""
+        return self._band.max() if self._band.size else 0
+
+    def to_dense(self) -> np.ndarray:
+        """ Return the equivalent dense n x n array."""
+        dense = np.zeros((self._n, self._n), dtype=self.dtype)
+        for k in range(self._band.shape[1]):
+            dense.ravel()[k :: self._n + 1][: self._n - k] = self.diagonal(k)
+        return dense
@@ -0,0 +1,171 @@
+"""
+    Compact binary storage of parsed families, alignments, folds and trees,
+    reloaded without parsing text again.
+"""
+import json
+import mmap
+import pathlib
+import struct
+import zipfile
+from typing import Any, Dict, Union
+
+import numpy as np
+
+from ..core.alignment import Alignment
+from ..core.datastructures import ArrayTree, Tree
+from ..core.dynamicprog import RNAStruct
+from ..core.scoring import ScoringModel
+from .parseRfam import StockholmFamily
+
+__all__ = ["save", "load"]
+
+# Version of the layout described in the docstring of save().
+_format_version: int = 1
+
+Storable = Union[Alignment, StockholmFamily, RNAStruct, Tree, ArrayTree]
+
+
+def _encode(text: str) -> np.ndarray:
+    """ Private function, do not call. ASCII codes of a string."""
+    return np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+
+
+def _decode(codes: np.ndarray) -> str:
+    """ Private function, do not call. String of an array of ASCII codes."""
+    return np.asarray(codes, dtype=np.uint8).tobytes().decode("ascii")
+
+
+def save(path: Union[str, pathlib.Path], obj: Storable) -> None:
+    """
+    Save an Alignment, a StockholmFamily, an RNAStruct or a (Array)Tree to `path`
+    as an uncompressed NumPy .npz archive, which load() reads back with
+    memory mapping. Every archive holds a "meta" entry, a JSON document
+    with the kind of object, the version of the layout and its scalar
+    attributes, and the following arrays :
+
+        alignment : "data", the (n_sequences, n_columns) uint8 array of
+                    Alignment.data, and "names".
+        family    : the arrays of its alignment ; the GF, GS, GC and GR
+                    annotations are stored in "meta".
+        fold      : "sequence", as ASCII codes, and "pairs", the int32 pair
+                    table ; "meta" holds the score and the parameters of the
+                    fold (max_span, scoring model, backend).
+        tree      : "parent", "kind" and "bases", the arrays of its
+                    ArrayTree ; "meta" tells if it was an ArrayTree.
+
+    Only RNAStruct itself is supported among the folds : the pair scores of
+    subclasses such as ConsensusFold cannot be rebuilt from a sequence.
+    """
+    meta: Dict[str, Any] = {"version": _format_version}
+    arrays: Dict[str, np.ndarray] = {}
+
+    if isinstance(obj, (Alignment, StockholmFamily)):
+        alignment = obj if isinstance(obj, Alignment) else obj.alignment
+        arrays = {
+            "data": np.ascontiguousarray(alignment.data),
+            "names": alignment.names,
+        }
+        meta["kind"] = "alignment"
+        if isinstance(obj, StockholmFamily):
+            meta["kind"] = "family"
+            meta.update(gf=obj.gf, gs=obj.gs, gc=obj.gc, gr=obj.gr)
+    elif type(obj) is RNAStruct:
+        score = obj.max_n_pairs
+        meta.update(
+            kind="fold",
+            score=score.item() if isinstance(score, np.generic) else score,
+            max_span=obj.max_span if obj.max_span < len(obj.sequence) - 1 else None,
+            weights=obj.scoring.weights,
+            min_loop=obj.scoring.min_loop,
+            backend=obj.backend,
+        )
+        arrays = {
+            "sequence": _encode(obj.sequence),
+            "pairs": obj.pair_table().astype(np.int32),
+        }
+    elif isinstance(obj, (Tree, ArrayTree)):
+        meta.update(kind="tree", array=isinstance(obj, ArrayTree))
+        tree = obj if isinstance(obj, ArrayTree) else ArrayTree.from_tree(obj)
+        arrays = {"parent": tree.parent, "kind": tree.kind, "bases": tree.bases}
+    else:
+        raise TypeError(f"Cannot save an object of type {type(obj)}")
+
+    with open(path, "wb") as f:
+        np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+
+
+def _read_arrays(
+    path: Union[str, pathlib.Path], memory_map: bool
+) -> Dict[str, np.ndarray]:
+    """
+    Private function, do not call.
+    Read the arrays of an .npz archive. With `memory_map`, the arrays of the
+    uncompressed members are read-only views of a single memory map of the
+    archive, at the offset of their data in the file.
+    """
+    arrays: Dict[str, np.ndarray] = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        buffer = None
+        if memory_map:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        for info in archive.infolist():
+            name = info.filename[: -len(".npy")]
+            if buffer is not None and info.compress_type == zipfile.ZIP_STORED:
+                # skip the local header of the member, then the .npy header
+                f.seek(info.header_offset + 26)
+                name_length, extra_length = struct.unpack("<HH", f.read(4))
+                f.seek(name_length + extra_length, 1)
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+                else:
+                    shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+                if not dtype.hasobject:
+                    count = int(np.prod(shape))
+                    data = np.frombuffer(buffer, dtype, count=count, offset=f.tell())
+                    arrays[name] = data.reshape(shape, order="F" if fortran else "C")
+                    continue
+            with archive.open(info) as member:
+                arrays[name] = np.lib.format.read_array(member)
+    return arrays
+
+
+def load(path: Union[str, pathlib.Path], memory_map: bool = True) -> Storable:
+    """
+    Load an object saved by save(). With memory_map=True (the default), the
+    large arrays (alignment data, pair tables, tree layouts) are read-only
+    memory maps of the file, so that only the parts actually used are read.
+
+    A loaded RNAStruct holds its score and pair table : max_n_pairs and the
+    tracebacks are available without folding, the pair scores and the matrix
+    are only computed if needed by another method.
+    """
+    arrays = _read_arrays(path, memory_map)
+    meta = json.loads(str(arrays.pop("meta")))
+    if meta.get("version") != _format_version:
+        raise ValueError(
+            f"Unsupported layout version {meta.get('version')} in {path}"
+        )
+
+    kind = meta["kind"]
+    if kind in ("alignment", "family"):
+        alignment = Alignment(arrays["names"], arrays["data"])
+        if kind == "alignment":
+            return alignment
+        annotations = {kind: meta[kind.lower()] for kind in StockholmFamily._kinds}
+        return StockholmFamily._from_alignment(alignment, annotations)
+    if kind == "fold":
+        # weights absent from the saved model were disabled
+        weights = dict.fromkeys(("AU", "UA", "CG", "GC"), 0)
+        weights.update(meta["weights"])
+        scoring = ScoringModel(weights, min_loop=meta["min_loop"])
+        fold = RNAStruct(
+            _decode(arrays["sequence"]), meta["max_span"], scoring, meta["backend"]
+        )
+        fold._pairs = np.array(arrays["pairs"], dtype=int)
+        fold._score = fold._score_dtype().type(meta["score"])
+        return fold
+    if kind == "tree":
+        tree = ArrayTree(arrays["parent"], arrays["kind"], arrays["bases"])
+        return tree if meta["array"] else tree.to_tree()
+    raise ValueError(f"Unknown kind of object {kind!r} in {path}")
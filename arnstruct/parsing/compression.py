@@ -0,0 +1,45 @@
+"""
+    Transparent reading of compressed (gzip, bzip2, xz) text files,
+    recognised by their magic bytes rather than by their extension.
+"""
+import bz2
+import gzip
+import lzma
+import pathlib
+from typing import IO, Callable, Dict, Optional, Union
+
+__all__ = ["compression_of", "open_text"]
+
+# Leading bytes of each supported compression format.
+_magic_bytes: Dict[str, bytes] = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+}
+
+_openers: Dict[str, Callable[..., IO]] = {
+    "gzip": gzip.open,
+    "bz2": bz2.open,
+    "xz": lzma.open,
+}
+
+
+def compression_of(filename: Union[str, pathlib.Path]) -> Optional[str]:
+    """Return the compression format of a file ("gzip", "bz2" or "xz"),
+    read from its first bytes, or None if it is not compressed."""
+    with open(filename, "rb") as f:
+        head = f.read(max(len(magic) for magic in _magic_bytes.values()))
+    for name, magic in _magic_bytes.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def open_text(filename: Union[str, pathlib.Path], encoding: str = "utf-8") -> IO[str]:
+    """Open a file for reading as a text stream, decompressing it on the fly
+    if it is compressed with gzip, bzip2 or xz : nothing is written to disk,
+    and lines are decompressed as they are read."""
+    compression = compression_of(filename)
+    if compression is None:
+        return open(filename, "r", encoding=encoding)
+    return _openers[compression](filename, "rt", encoding=encoding)
@@ -0,0 +1,103 @@
+"""
+    Streaming reader of (possibly compressed) FASTA files,
+    such as the per-family Rfam .fa.gz files.
+"""
+import pathlib
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..core.sequence import Sequence
+from .compression import open_text
+
+__all__ = ["FastaParser"]
+
+
+class FastaParser(object):
+    """
+    Streaming parser of FASTA files, yielding validated Sequence objects
+    in chunks of at most `chunk_size` records, as lists of (name, Sequence)
+    tuples. The name is the header line, without its leading ">".
+
+    Files are read line by line, and decompressed on the fly if compressed
+    with gzip, bzip2 or xz (see open_text()), so that only the current chunk
+    is held in memory.
+
+    Parameters :
+        chunk_size   : number of records per yielded list.
+        dna          : should T be read as U ? (Rfam FASTA files hold RNA,
+                       but genomic sources often use T)
+        skip_invalid : should records holding characters other than A, C, G,
+                       U be skipped instead of raising a ValueError ?
+
+    >>> for chunk in FastaParser(chunk_size=10000)("Rfam/RF02913.fa.gz"):
+    ...     folds = fold_many(sequence.sequence for _, sequence in chunk)
+    """
+
+    def __init__(
+        self, chunk_size: int = 1024, dna: bool = False, skip_invalid: bool = False
+    ):
+        if chunk_size < 1:
+            raise ValueError(
+                f"chunk_size should be a positive integer, not {chunk_size}"
+            )
+        self._chunk_size: int = chunk_size
+        self._dna: bool = dna
+        self._skip_invalid: bool = skip_invalid
+
+    def __call__(
+        self, filename: Union[str, pathlib.Path]
+    ) -> Iterator[List[Tuple[str, Sequence]]]:
+        """ Return a generator over the chunks of records of a FASTA file."""
+        if not isinstance(filename, (str, pathlib.Path)):
+            raise TypeError(
+                f"Cannot read from object of class {type(filename)}, "
+                "please provide a string or pathlib.Path instance."
+            )
+        return self.__read(filename)
+
+    def __read(
+        self, filename: Union[str, pathlib.Path]
+    ) -> Iterator[List[Tuple[str, Sequence]]]:
+        """ Private method, do not call. Open the file when iteration begins."""
+        with open_text(filename) as f:
+            yield from self.parse_lines(f)
+
+    def parse_lines(self, lines: Iterable[str]) -> Iterator[List[Tuple[str, Sequence]]]:
+        """Parse FASTA records from an iterable of lines, and yield them in
+        chunks of validated (name, Sequence) tuples."""
+        chunk: List[Tuple[str, Sequence]] = []
+        for name, residues in self.records(lines):
+            if self._dna:
+                residues = residues.replace("T", "U").replace("t", "u")
+            try:
+                sequence = Sequence(residues)
+            except ValueError:
+                if self._skip_invalid:
+                    continue
+                raise ValueError(f"Record {name!r} contains invalid characters")
+            chunk.append((name, sequence))
+            if len(chunk) == self._chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def records(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+        """Split FASTA lines into (name, residues) string pairs, joining the
+        lines of multi-line records, without any validation."""
+        name: Optional[str] = None
+        pieces: List[str] = []
+        for lineno, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line or line.startswith(";"):
+                continue
+            if line.startswith(">"):
+                if name is not None:
+                    yield name, "".join(pieces)
+                name, pieces = line[1:].strip(), []
+            elif name is None:
+                raise ValueError(f"Invalid FASTA input, line {lineno} : no header")
+            else:
+                pieces.append(line)
+        if name is not None:
+            yield name, "".join(pieces)
@@ -1,7 +1,30 @@
+import json
+import mmap
+import os
 import pathlib
-from typing import Dict, Optional, Union, NoReturn, List, Tuple, Type, Any
+import re
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NoReturn,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
+from ..core.alignment import Alignment
 from ..core.datastructures import Stack
+from .compression import compression_of, open_text
 
 
 def check_token_balance(expr: str) -> bool:
@@ -35,8 +58,237 @@ def check_token_balance(expr: str) -> bool:
     return True if s.is_empty() else False
 
 
+def _stockholm_error(lineno: int, message: str) -> ValueError:
+    """ Private function, do not call. Error raised on malformed input."""
+    return ValueError(f"Invalid Stockholm input, line {lineno} : {message}")
+
+
+# Annotation lines kept unparsed : (line number, stripped line)
+RawLines = List[Tuple[int, str]]
+
+
+class StockholmFamily(object):
+    """
+    One record (family) of a Stockholm file, as yielded by StockholmParser.
+
+    Attributes :
+        gf        : file annotations, "#=GF <tag> <text>", mapping each tag
+                    to the list of its lines (tags such as AU or RT span
+                    several lines).
+        gs        : sequence annotations, "#=GS <seqname> <tag> <text>",
+                    mapping each sequence name to {tag: [lines]}.
+        sequences : aligned sequences, mapping each name to its row, in the
+                    order of the file. Interleaved blocks are concatenated.
+        gc        : column annotations, "#=GC <feature> <annotation>",
+                    mapping each feature (e.g. SS_cons, RF) to its row.
+        gr        : residue annotations, "#=GR <seqname> <feature> <row>",
+                    mapping each sequence name to {feature: row}.
+
+    Annotations that were not selected when parsing (see StockholmParser)
+    are empty. Those parsed lazily are only tokenized on first access.
+    """
+
+    # kinds of annotation lines, in the order of the attributes
+    _kinds: Tuple[str, ...] = ("GF", "GS", "GC", "GR")
+
+    def __init__(
+        self,
+        gf: Optional[Dict[str, List[str]]] = None,
+        gs: Optional[Dict[str, Dict[str, List[str]]]] = None,
+        sequences: Optional[Dict[str, str]] = None,
+        gc: Optional[Dict[str, str]] = None,
+        gr: Optional[Dict[str, Dict[str, str]]] = None,
+    ):
+        self._annotations: Dict[str, Dict[str, Any]] = {
+            "GF": gf or {},
+            "GS": gs or {},
+            "GC": gc or {},
+            "GR": gr or {},
+        }
+        self._sequences: Optional[Dict[str, str]] = sequences or {}
+        self._alignment: Optional[Alignment] = None
+        # annotation lines left to parse on first access, by kind
+        self._raw: Dict[str, RawLines] = {}
+
+    @classmethod
+    def _from_lines(
+        cls, sequences: Dict[str, str], annotations: Dict[str, RawLines], lazy: bool
+    ) -> "StockholmFamily":
+        """Private method, do not call.
+        Build a family from its annotation lines, parsed now unless `lazy`."""
+        family = cls(sequences=sequences)
+        family._raw = annotations
+        if not lazy:
+            for kind in list(annotations):
+                family._annotation(kind)
+        return family
+
+    @classmethod
+    def _from_alignment(
+        cls, alignment: Alignment, annotations: Dict[str, Dict[str, Any]]
+    ) -> "StockholmFamily":
+        """Private method, do not call.
+        Build a family from its Alignment and its parsed annotations : the
+        rows of `sequences` are only decoded on first access."""
+        family = cls()
+        family._annotations.update(annotations)
+        family._sequences, family._alignment = None, alignment
+        return family
+
+    @property
+    def sequences(self) -> Dict[str, str]:
+        if self._sequences is None:
+            self._sequences = dict(self._alignment)
+        return self._sequences
+
+    @sequences.setter
+    def sequences(self, sequences: Dict[str, str]):
+        self._sequences, self._alignment = sequences, None
+
+    def _annotation(self, kind: str) -> Dict[str, Any]:
+        """Private method, do not call.
+        Annotations of a kind, parsing their lines if not done yet."""
+        if kind in self._raw:
+            self._annotations[kind] = self._parse_annotations(kind, self._raw.pop(kind))
+        return self._annotations[kind]
+
+    @staticmethod
+    def _parse_annotations(kind: str, lines: RawLines) -> Dict[str, Any]:
+        """Private method, do not call.
+        Parse the "#=<kind>" lines of a record, joining interleaved blocks."""
+        parsed: Dict[str, Any] = {}
+        for lineno, line in lines:
+            if kind == "GF":
+                _, tag, *text = line.split(None, 2)
+                parsed.setdefault(tag, []).append(text[0] if text else "")
+            elif kind == "GC":
+                fields = line.split(None, 2)
+                if len(fields) != 3:
+                    raise _stockholm_error(lineno, "malformed #=GC line")
+                parsed.setdefault(fields[1], []).append(fields[2])
+            elif kind == "GS":
+                fields = line.split(None, 3)
+                if len(fields) < 3:
+                    raise _stockholm_error(lineno, "malformed #=GS line")
+                tags = parsed.setdefault(fields[1], {})
+                tags.setdefault(fields[2], []).append(fields[3] if fields[3:] else "")
+            else:
+                fields = line.split(None, 3)
+                if len(fields) != 4:
+                    raise _stockholm_error(lineno, "malformed #=GR line")
+                features = parsed.setdefault(fields[1], {})
+                features.setdefault(fields[2], []).append(fields[3])
+
+        if kind == "GC":
+            return {feature: "".join(rows) for feature, rows in parsed.items()}
+        if kind == "GR":
+            return {
+                name: {feature: "".join(rows) for feature, rows in features.items()}
+                for name, features in parsed.items()
+            }
+        return parsed
+
+    @property
+    def gf(self) -> Dict[str, List[str]]:
+        return self._annotation("GF")
+
+    @property
+    def gs(self) -> Dict[str, Dict[str, List[str]]]:
+        return self._annotation("GS")
+
+    @property
+    def gc(self) -> Dict[str, str]:
+        return self._annotation("GC")
+
+    @property
+    def gr(self) -> Dict[str, Dict[str, str]]:
+        return self._annotation("GR")
+
+    def __repr__(self):
+        return (
+            f"StockholmFamily(accession={self.accession!r}, "
+            f"identifier={self.identifier!r}, n_sequences={len(self)})"
+        )
+
+    def __len__(self):
+        if self._sequences is None:
+            return len(self._alignment)
+        return len(self._sequences)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        """ Iterate over the (name, aligned sequence) pairs."""
+        return iter(self.sequences.items())
+
+    def __getitem__(self, name: str) -> str:
+        return self.sequences[name]
+
+    @property
+    def accession(self) -> Optional[str]:
+        """ Accession number of the family (#=GF AC), e.g. RF02913."""
+        return self.gf["AC"][0] if "AC" in self.gf else None
+
+    @property
+    def identifier(self) -> Optional[str]:
+        """ Identifier of the family (#=GF ID), e.g. pemK."""
+        return self.gf["ID"][0] if "ID" in self.gf else None
+
+    @property
+    def ss_cons(self) -> Optional[str]:
+        """ Consensus secondary structure (#=GC SS_cons), in WUSS notation."""
+        return self.gc.get("SS_cons")
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.sequences)
+
+    @property
+    def alignment(self) -> Alignment:
+        """Columnar view of the aligned sequences (see Alignment), built on
+        first access unless the parser was created with columnar=True."""
+        if self._alignment is None:
+            self._alignment = Alignment.from_rows(
+                self.sequences.keys(), self.sequences.values()
+            )
+        return self._alignment
+
+
 class StockholmParser(object):
-    """ """
+    """
+    Streaming parser of (multi-record) Stockholm files, such as Rfam.seed.
+
+    Calling the parser on a file returns a generator of StockholmFamily,
+    reading the file line by line : only the family being parsed is held
+    in memory, so that the memory use is bounded by the largest family,
+    not by the size of the file. Files compressed with gzip, bzip2 or xz
+    (e.g. Rfam.seed.gz) are decompressed on the fly.
+
+    >>> parser = StockholmParser()
+    >>> for family in parser("Rfam.seed"):
+    ...     print(family.accession, len(family), family.ss_cons)
+
+    Single families can be read without parsing the rest of the file,
+    through a sidecar index of the byte range of every record (see
+    StockholmParser.index()) :
+
+    >>> family = parser.fetch("Rfam.seed", "RF02913")   # or the ID, "pemK"
+
+    Large files can be parsed by a pool of processes, each one handling a
+    byte range of whole records (see StockholmParser.parse_parallel()) :
+
+    >>> families = list(parser.parse_parallel("Rfam.seed", workers=8))
+
+    With columnar=True, the Alignment of every family (family.alignment)
+    is built as soon as the family is parsed.
+
+    Sequences are always parsed, but annotations can be restricted to the
+    `fields` actually needed : kinds of annotations ("GF", "GS", "GC", "GR")
+    or single tags or features (e.g. "GF:AC", "GC:SS_cons"). Lines of other
+    kinds are skipped without being tokenized. With lazy=True, the selected
+    annotation lines are kept as they are and only parsed when the matching
+    attribute of the family is first accessed.
+
+    >>> parser = StockholmParser(fields=["GF:AC", "GF:ID", "GC:SS_cons"])
+    """
 
     __valid_file_classes: List[Type] = [str, pathlib.Path]
 
@@ -56,16 +308,311 @@ def __type_error(x: Any) -> str:
             ]
         )
 
-    def __init__(self):
-        pass
+    # Version of the layout of the sidecar index files.
+    _index_version: int = 1
 
-    def __call__(self, filename: Union[str, pathlib.Path]):
-        """ """
+    __record_begin = re.compile(rb"^# STOCKHOLM", re.MULTILINE)
+    __record_end = re.compile(rb"^//[ \t\r]*(?:\n|$)", re.MULTILINE)
+    __record_keys = re.compile(rb"^#=GF[ \t]+(?:AC|ID)[ \t]+(\S+)", re.MULTILINE)
+
+    def __init__(
+        self,
+        columnar: bool = False,
+        fields: Optional[Iterable[str]] = None,
+        lazy: bool = False,
+    ):
+        self._columnar: bool = columnar
+        self._lazy: bool = lazy
+        # selected tags of each kind of annotation, None to keep them all
+        self._selection: Dict[str, Optional[Set[str]]] = {
+            kind: None for kind in StockholmFamily._kinds
+        }
+        if fields is not None:
+            self._selection = {}
+            for field in fields:
+                kind, _, tag = field.partition(":")
+                if kind not in StockholmFamily._kinds:
+                    raise ValueError(
+                        f"Invalid field {field!r}. Fields are annotation kinds "
+                        f"{StockholmFamily._kinds}, optionally restricted to a "
+                        'tag or feature, e.g. "GF:AC" or "GC:SS_cons"'
+                    )
+                if not tag:
+                    self._selection[kind] = None
+                elif kind not in self._selection or self._selection[kind] is not None:
+                    self._selection.setdefault(kind, set()).add(tag)
+
+    @staticmethod
+    def __require_uncompressed(filename: Union[str, pathlib.Path]):
+        """ Private method, do not call. Reject files without byte addressing."""
+        compression = compression_of(filename)
+        if compression is not None:
+            raise ValueError(
+                f"{filename} is compressed ({compression}) : byte ranges are only "
+                "available on uncompressed files"
+            )
+
+    @staticmethod
+    def index_path(filename: Union[str, pathlib.Path]) -> pathlib.Path:
+        """ Path of the sidecar index of a Stockholm file."""
+        path = pathlib.Path(filename)
+        return path.with_name(path.name + ".idx")
+
+    def index(self, filename: Union[str, pathlib.Path]) -> Dict[str, Tuple[int, int]]:
+        """Return the byte range [start, end) of every record of a Stockholm
+        file, keyed by both its accession (#=GF AC) and its identifier
+        (#=GF ID).
+
+        The index is persisted next to the file (see self.index_path()) and
+        reused as long as the size and modification time of the file are
+        unchanged ; otherwise it is rebuilt, scanning the memory-mapped file
+        with regular expressions instead of parsing it. If the sidecar cannot
+        be written, the index is rebuilt on every call.
+
+        Byte ranges are meaningless in compressed files, which cannot be
+        indexed (ValueError).
+        """
+        _is_valid_instance: bool = any(
+            isinstance(filename, allowed) for allowed in self.__valid_file_classes
+        )
+        if not _is_valid_instance:
+            raise TypeError(self.__type_error(filename))
+        self.__require_uncompressed(filename)
+
+        stat = os.stat(filename)
+        signature = [self._index_version, stat.st_size, stat.st_mtime_ns]
+        sidecar = self.index_path(filename)
+        try:
+            with open(sidecar, "r") as f:
+                stored = json.load(f)
+            if stored["signature"] == signature:
+                return {key: tuple(span) for key, span in stored["records"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        records = self.__scan(filename)
+        try:
+            descriptor, temporary = tempfile.mkstemp(dir=sidecar.parent)
+        except OSError:
+            return records
+        try:
+            with os.fdopen(descriptor, "w") as f:
+                json.dump({"signature": signature, "records": records}, f)
+            os.replace(temporary, sidecar)
+        except OSError:
+            os.unlink(temporary)
+        return records
+
+    def __scan(self, filename: Union[str, pathlib.Path]) -> Dict[str, Tuple[int, int]]:
+        """ Private method, do not call. Build the index of a Stockholm file."""
+        records: Dict[str, Tuple[int, int]] = {}
+        if os.path.getsize(filename) == 0:
+            return records
+
+        with open(filename, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            # keep offsets only : match objects would pin the memory map
+            begins = [match.start() for match in self.__record_begin.finditer(data)]
+            ends = [match.span() for match in self.__record_end.finditer(data)]
+            position = 0
+            for start in begins:
+                while position < len(ends) and ends[position][0] < start:
+                    position += 1
+                if position == len(ends):
+                    break
+                end = ends[position][1]
+                for key in self.__record_keys.findall(data, start, end):
+                    records.setdefault(key.decode(), (start, end))
+        return records
+
+    def fetch(self, filename: Union[str, pathlib.Path], key: str) -> StockholmFamily:
+        """Parse the single family of a Stockholm file whose accession or
+        identifier is `key`, reading only its byte range from a memory map
+        of the file. Raises KeyError if there is no such family."""
+        records = self.index(filename)
+        if key not in records:
+            raise KeyError(f"No family {key!r} in {filename}")
+        (family,) = self.parse_range(filename, *records[key])
+        return family
+
+    def parse_range(
+        self, filename: Union[str, pathlib.Path], start: int, end: int
+    ) -> List[StockholmFamily]:
+        """Parse the records held in the bytes [start, end) of a Stockholm
+        file, read from a memory map of the file. The range must begin and end
+        on record boundaries, see self.split_ranges()."""
+        if start >= end:
+            return []
+        with open(filename, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            text = data[start:end].decode()
+        return list(self.parse_lines(text.splitlines()))
+
+    def split_ranges(
+        self, filename: Union[str, pathlib.Path], n_ranges: int
+    ) -> List[Tuple[int, int]]:
+        """Split a Stockholm file into at most `n_ranges` byte ranges of about
+        the same size, each one holding whole records : every range but the
+        last one ends right after a "//" terminator line."""
+        self.__require_uncompressed(filename)
+        size = os.path.getsize(filename)
+        if size == 0:
+            return []
+
+        bounds = [0]
+        with open(filename, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            for k in range(1, n_ranges):
+                target = max(size * k // n_ranges, bounds[-1])
+                terminator = data.find(b"\n//", max(target - 1, 0))
+                if terminator < 0:
+                    break
+                newline = data.find(b"\n", terminator + 3)
+                end = size if newline < 0 else newline + 1
+                if end > bounds[-1]:
+                    bounds.append(end)
+        if bounds[-1] < size:
+            bounds.append(size)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def parse_parallel(
+        self,
+        filename: Union[str, pathlib.Path],
+        workers: Optional[int] = None,
+        ranges_per_worker: int = 4,
+    ) -> Iterator[StockholmFamily]:
+        """Parse a Stockholm file with a pool of `workers` processes
+        (os.cpu_count() by default), yielding the families in file order.
+
+        The file is split into byte ranges aligned on record terminators (see
+        self.split_ranges()), parsed independently by the workers. Results are
+        yielded range after range, in order, while at most two ranges per
+        worker are submitted ahead, so that memory stays bounded by the size
+        of these ranges and not by the size of the file.
+
+        A compressed file cannot be split, it is parsed as a single stream.
+        """
+        _is_valid_instance: bool = any(
+            isinstance(filename, allowed) for allowed in self.__valid_file_classes
+        )
+        if not _is_valid_instance:
+            raise TypeError(self.__type_error(filename))
+        workers = workers or os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError(f"workers should be a positive integer, not {workers}")
+
+        return self.__parse_parallel(filename, workers, ranges_per_worker)
+
+    def __parse_parallel(
+        self, filename: Union[str, pathlib.Path], workers: int, ranges_per_worker: int
+    ) -> Iterator[StockholmFamily]:
+        """Private method, do not call. Generator of self.parse_parallel(),
+        whose arguments are validated before iteration begins."""
+        if compression_of(filename) is not None:
+            yield from self.__read(filename)
+            return
+
+        ranges = iter(self.split_ranges(filename, workers * ranges_per_worker))
+        if workers == 1:
+            for start, end in ranges:
+                yield from self.parse_range(filename, start, end)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending: Deque[Future] = deque(
+                executor.submit(_parse_range, self, filename, start, end)
+                for start, end in islice(ranges, 2 * workers)
+            )
+            while pending:
+                families = pending.popleft().result()
+                following = next(ranges, None)
+                if following is not None:
+                    pending.append(
+                        executor.submit(_parse_range, self, filename, *following)
+                    )
+                yield from families
+
+    def __call__(self, filename: Union[str, pathlib.Path]) -> Iterator[StockholmFamily]:
+        """Return a generator over the families of the Stockholm file
+        `filename`, parsed one at a time."""
         _is_valid_instance: bool = any(
             isinstance(filename, allowed) for allowed in self.__valid_file_classes
         )
         if not _is_valid_instance:
             raise TypeError(self.__type_error(filename))
 
-        with open(filename, "r") as f:
-            lines: List[str] = [line.strip() for line in f.readlines()]
+        return self.__read(filename)
+
+    def __read(self, filename: Union[str, pathlib.Path]) -> Iterator[StockholmFamily]:
+        """ Private method, do not call. Open the file when iteration begins."""
+        with open_text(filename) as f:
+            yield from self.parse_lines(f)
+
+    def parse_lines(self, lines: Iterable[str]) -> Iterator[StockholmFamily]:
+        """Parse Stockholm records from an iterable of lines (an open text
+        file, a list of strings...) and yield each family as soon as its
+        terminating "//" line is read."""
+        begin, end = self.__special_tokens["begin"], self.__special_tokens["end"]
+        selection = self._selection
+        sequences: Optional[Dict[str, List[str]]] = None
+        annotations: Dict[str, RawLines] = {}
+        lineno = 0
+
+        for lineno, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith(begin):
+                if sequences is not None:
+                    raise _stockholm_error(lineno, f"missing {end!r} before")
+                sequences, annotations = {}, {}
+                continue
+            if sequences is None:
+                raise _stockholm_error(lineno, "data outside of a record")
+            if line == end:
+                family = StockholmFamily._from_lines(
+                    {name: "".join(rows) for name, rows in sequences.items()},
+                    annotations,
+                    self._lazy,
+                )
+                if self._columnar:
+                    family.alignment  # built and cached on first access
+                yield family
+                sequences = None
+            elif line.startswith("#="):
+                kind = line[2:4]
+                if kind not in selection:
+                    continue
+                tags = selection[kind]
+                if tags is not None and self.__tag(kind, line) not in tags:
+                    continue
+                annotations.setdefault(kind, []).append((lineno, line))
+            elif line.startswith("#"):
+                continue
+            else:
+                fields = line.split()
+                if len(fields) != 2:
+                    raise _stockholm_error(lineno, "malformed sequence line")
+                sequences.setdefault(fields[0], []).append(fields[1])
+
+        if sequences is not None:
+            raise _stockholm_error(lineno, f"unterminated record, missing {end!r}")
+
+    @staticmethod
+    def __tag(kind: str, line: str) -> Optional[str]:
+        """Private method, do not call.
+        Tag (GF, GS) or feature (GC, GR) of an annotation line."""
+        fields = line.split(None, 3)
+        position = 1 if kind in ("GF", "GC") else 2
+        return fields[position] if len(fields) > position else None
+
+
+def _parse_range(
+    parser: StockholmParser, filename: Union[str, pathlib.Path], start: int, end: int
+) -> List[StockholmFamily]:
+    """Private function, do not call.
+    Entry point of the worker processes of StockholmParser.parse_parallel()."""
+    return parser.parse_range(filename, start, end)
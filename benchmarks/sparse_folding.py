@@ -0,0 +1,63 @@
+"""
+    Compare the dense and sparse backends of RNAStruct on real
+    Rfam sequences, taken from the family stored in data/.
+
+    Usage :
+        $ python benchmarks/sparse_folding.py [n_sequences]
+"""
+import pathlib
+import sys
+import time
+from typing import Callable, List
+
+from arnstruct.core.dynamicprog import RNAStruct
+from arnstruct.core.scoring import ScoringModel
+from arnstruct.core.sequence import Sequence
+
+DATA: pathlib.Path = pathlib.Path(__file__).parent.parent / "data"
+
+
+def read_rfam_sequences(filename: pathlib.Path) -> List[str]:
+    """ Ungapped sequences of a Stockholm alignment, skipping invalid ones."""
+    sequences: List[str] = []
+    with open(filename, "r") as f:
+        for line in f:
+            if not line.strip() or line.startswith(("#", "//")):
+                continue
+            _, aligned = line.split()
+            sequence = aligned.replace("-", "").replace(".", "").upper()
+            if Sequence.is_valid_sequence(sequence):
+                sequences.append(sequence)
+    return sequences
+
+
+def timed(function: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def compare(label: str, sequences: List[str], scoring: ScoringModel) -> None:
+    times = {}
+    for backend in ("dense", "sparse"):
+        folds = [RNAStruct(s, scoring=scoring, backend=backend) for s in sequences]
+        times[backend] = timed(lambda: [fold.max_n_pairs for fold in folds])
+    print(
+        f"{label:<40} dense {times['dense']:8.3f} s   sparse {times['sparse']:8.3f} s"
+        f"   speedup x{times['dense'] / times['sparse']:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    n_sequences = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sequences = read_rfam_sequences(DATA / "RF02913.stockholm.txt")[:n_sequences]
+
+    # The speedup depends on the number of candidate pairs, which is
+    # much larger when short hairpins are forbidden (min_loop).
+    for scoring in (ScoringModel(), ScoringModel(wobble=True, min_loop=3)):
+        print(scoring)
+        compare(f"{len(sequences)} RF02913 sequences", sequences, scoring)
+        for length in (1000, 2000, 3000):
+            # members of the family laid end to end, as in a genomic region
+            region = "".join(sequences)[:length]
+            compare(f"RF02913 region of {length} nt", [region], scoring)
@@ -0,0 +1,195 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+from arnstruct.core.alignment import Alignment
+from arnstruct.parsing.parseRfam import StockholmParser
+
+DATA = pathlib.Path(__file__).parent.parent / "data" / "RF02913.stockholm.txt"
+
+
+@pytest.fixture
+def alignment():
+    return Alignment.from_rows(["s1", "s2", "s3"], ["AC-GU.", "a-cgtN", "----U~"])
+
+
+def test_rows_and_names(alignment):
+    assert alignment.shape == (3, 6) and len(alignment) == 3
+    assert alignment.data.dtype == np.uint8
+    assert alignment[1] == "a-cgtN"
+    assert dict(alignment) == {"s1": "AC-GU.", "s2": "a-cgtN", "s3": "----U~"}
+    assert alignment.index("s3") == 2
+    with pytest.raises(KeyError):
+        alignment.index("s4")
+    with pytest.raises(ValueError):
+        Alignment.from_rows(["s1", "s2"], ["ACGU", "ACG"])
+
+
+def test_gaps_and_composition(alignment):
+    np.testing.assert_array_equal(
+        alignment.gap_mask(),
+        [[0, 0, 1, 0, 0, 1], [0, 1, 0, 0, 0, 0], [1, 1, 1, 1, 0, 1]],
+    )
+    composition = alignment.composition()
+    assert composition.shape == (6, 6)
+    np.testing.assert_array_equal(composition.sum(axis=1), 3)
+    assert composition[0].tolist() == [2, 0, 0, 0, 1, 0]
+    assert composition[4].tolist() == [0, 0, 0, 3, 0, 0]
+    assert composition[5].tolist() == [0, 0, 0, 0, 2, 1]
+
+
+def test_degap_and_column_maps(alignment):
+    sequence, columns = alignment.degap(0)
+    assert sequence == "ACGU" and columns.tolist() == [0, 1, 3, 4]
+    maps = alignment.column_maps()
+    assert maps[0].tolist() == [0, 1, -1, 2, 3, -1]
+    assert maps[2].tolist() == [-1, -1, -1, -1, 0, -1]
+
+
+def test_column_slices_share_memory(alignment):
+    sliced = alignment.columns(1, 5)
+    assert sliced.shape == (3, 4)
+    assert np.shares_memory(sliced.data, alignment.data)
+    assert sliced[0] == "C-GU"
+    assert alignment.rows([0, 2]).names.tolist() == ["s1", "s3"]
+
+
+def test_columnar_parsing():
+    (family,) = StockholmParser(columnar=True)(DATA)
+    assert family._alignment is not None
+    alignment = family.alignment
+    assert alignment.shape == (1542, len(family.ss_cons))
+    name = family.names[10]
+    assert alignment[alignment.index(name)] == family[name]
+
+
+def test_wuss_pair_table():
+    from arnstruct.core.parentheses import Parentheses
+
+    expected = [4, 3, -1, 1, 0, -1, 8, -1, 6]
+    assert Parentheses.pair_table("<<_>>,(.)").tolist() == expected
+    assert Parentheses.pair_table("<A>a").tolist() == [2, -1, 0, -1]
+    assert Parentheses.pair_table("<A>a", pseudoknots=True).tolist() == [2, 3, 0, 1]
+    with pytest.raises(ValueError):
+        Parentheses.pair_table("<<>")
+    with pytest.raises(ValueError):
+        Parentheses.pair_table("(>")
+
+
+def test_structure_projection():
+    alignment = Alignment.from_rows(
+        ["s1", "s2", "s3"], ["GGAAACC", "G-AAAUC", "GGA--CC"]
+    )
+    ss_cons = "<<...>>"
+    assert alignment.degapped() == ["GGAAACC", "GAAAUC", "GGACC"]
+    pairs = alignment.project_pairs(ss_cons)
+    assert [table.tolist() for table in pairs] == [
+        [6, 5, -1, -1, -1, 1, 0],
+        [5, -1, -1, -1, -1, 0],
+        [4, 3, -1, 1, 0],
+    ]
+    assert alignment.project_parentheses(ss_cons) == ["((---))", "(----)", "((-))"]
+    with pytest.raises(ValueError):
+        alignment.project_pairs("<<..>>")
+
+
+def test_projection_on_rfam_family():
+    from arnstruct.core.datastructures import Tree
+    from arnstruct.core.parentheses import Parentheses
+
+    (family,) = StockholmParser(columnar=True)(DATA)
+    alignment = family.alignment
+    structures = alignment.project_parentheses(family.ss_cons)
+    sequences = alignment.degapped()
+    consensus = Parentheses.pair_table(family.ss_cons)
+    for index in (0, 500, 1541):
+        sequence, columns = alignment.degap(index)
+        assert sequences[index] == sequence
+        assert len(structures[index]) == len(sequence)
+        assert Parentheses.check_token_balance(structures[index])
+        # a pair survives iff both of its columns hold a residue
+        survivors = [c for c in columns if consensus[c] in columns]
+        assert structures[index].count("(") * 2 == len(survivors)
+        Tree.from_parentheses_and_sequence(structures[index], sequence)
+
+
+def naive_mutual_information(rows, i, j):
+    from collections import Counter
+    from math import log2
+
+    pairs = [(row[i], row[j]) for row in rows if row[i] in "ACGU" and row[j] in "ACGU"]
+    joint = Counter(pairs)
+    left, right = Counter(a for a, _ in pairs), Counter(b for _, b in pairs)
+    n = len(pairs)
+    return sum(
+        count / n * log2(count * n / (left[a] * right[b]))
+        for (a, b), count in joint.items()
+    )
+
+
+def random_alignment(n_sequences, n_columns, seed):
+    rng = np.random.default_rng(seed)
+    rows = ["".join(rng.choice(list("ACGU-"), n_columns)) for _ in range(n_sequences)]
+    return rows, Alignment.from_rows(map(str, range(n_sequences)), rows)
+
+
+def test_mutual_information_matches_naive():
+    rows, alignment = random_alignment(30, 9, 0)
+    mi = alignment.mutual_information()
+    assert mi.shape == (9, 9)
+    np.testing.assert_allclose(mi, mi.T)
+    np.testing.assert_array_equal(np.diag(mi), 0)
+    for i in range(9):
+        for j in range(i + 1, 9):
+            assert mi[i, j] == pytest.approx(naive_mutual_information(rows, i, j))
+
+
+def test_mutual_information_blocks_and_options():
+    rows, alignment = random_alignment(25, 14, 1)
+    full = alignment.mutual_information()
+    alignment._block_cells = 20
+    np.testing.assert_allclose(alignment.mutual_information(), full)
+
+    corrected = alignment.mutual_information(apc=True)
+    means = full.sum(axis=1) / 13
+    expected = full - np.outer(means, means) / (full.sum() / (14 * 13))
+    np.fill_diagonal(expected, 0)
+    np.testing.assert_allclose(corrected, expected)
+
+    structure = "<<<..(..)..>>>"
+    paired = alignment.mutual_information(structure=structure)
+    mask = np.zeros_like(full, dtype=bool)
+    for i, j in [(0, 13), (1, 12), (2, 11), (5, 8)]:
+        mask[i, j] = mask[j, i] = True
+    np.testing.assert_allclose(paired[mask], full[mask])
+    assert not paired[~mask].any()
+    with pytest.raises(ValueError):
+        alignment.mutual_information(apc=True, structure=structure)
+
+
+@pytest.mark.parametrize("block_cells", [1, 200, 10**6])
+def test_banded_pair_counts_match_dense(block_cells):
+    _, alignment = random_alignment(12, 17, 2)
+    alignment._block_cells = block_cells
+    one_hot = alignment.one_hot()
+    dense = np.concatenate([counts for _, _, counts in alignment._pair_counts(one_hot)])
+    for max_span in (0, 4, 30):
+        band = np.concatenate(
+            [counts for _, _, counts in alignment._pair_counts(one_hot, max_span)]
+        )
+        assert band.shape == (17, max_span + 1, 4, 4)
+        for i in range(17):
+            for k in range(max_span + 1):
+                if i + k < 17:
+                    np.testing.assert_array_equal(band[i, k], dense[i, i + k])
+                else:
+                    assert not band[i, k].any()
+
+
+def test_covarying_columns_have_high_mutual_information():
+    rows = ["GAAAC", "CAAAG", "AAAAU", "UAAAA"] * 5
+    alignment = Alignment.from_rows(map(str, range(len(rows))), rows)
+    mi = alignment.mutual_information()
+    assert mi[0, 4] == pytest.approx(2.0)
+    assert mi[0, 1] == 0
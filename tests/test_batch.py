@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from arnstruct.core.batch import fold_many
+from arnstruct.core.dynamicprog import RNAStruct
+from arnstruct.core.scoring import ScoringModel
+
+
+def random_rna(length: int, seed: int) -> str:
+    rng = random.Random(seed)
+    return "".join(rng.choice("AUCG") for _ in range(length))
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_fold_many_matches_single_folds(workers):
+    sequences = [random_rna(length, seed) for seed, length in enumerate([5, 80, 0, 31])]
+    scoring = ScoringModel(wobble=True, min_loop=3)
+    results = list(fold_many(sequences, workers=workers, scoring=scoring))
+    assert sorted(result.index for result in results) == list(range(len(sequences)))
+    for result in results:
+        fold = RNAStruct(sequences[result.index], scoring=scoring)
+        assert result.max_n_pairs == fold.max_n_pairs
+        assert result.pairs.tolist() == fold.pair_table().tolist()
+
+
+def test_fold_many_is_longest_first_in_process():
+    sequences = [random_rna(length, 0) for length in [10, 40, 25]]
+    assert [result.index for result in fold_many(sequences, workers=1)] == [1, 2, 0]
+
+
+def test_fold_many_invalid_arguments():
+    # raised by the call itself, before iterating
+    with pytest.raises(ValueError):
+        fold_many(["ACGU", "ACGT"], workers=2)
+    with pytest.raises(ValueError):
+        fold_many(["ACGU"], workers=2, backend="quantum")
+
+
+def test_fold_many_stopped_early():
+    sequences = [random_rna(length, seed) for seed, length in enumerate([60] * 6)]
+    results = fold_many(sequences, workers=2)
+    first = next(results)
+    results.close()
+    assert first.index in range(6)
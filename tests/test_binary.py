@@ -0,0 +1,93 @@
+import pathlib
+import time
+
+import numpy as np
+import pytest
+
+from arnstruct.core.alignment import Alignment
+from arnstruct.core.datastructures import ArrayTree, Tree
+from arnstruct.core.dynamicprog import RNAStruct
+from arnstruct.core.scoring import ScoringModel
+from arnstruct.parsing.binary import load, save
+from arnstruct.parsing.parseRfam import StockholmParser
+
+DATA = pathlib.Path(__file__).parent.parent / "data" / "RF02913.stockholm.txt"
+
+
+@pytest.fixture(scope="module")
+def family():
+    return next(StockholmParser()(DATA))
+
+
+@pytest.mark.parametrize("memory_map", [True, False])
+def test_alignment_round_trip(tmp_path, memory_map):
+    alignment = Alignment.from_rows(["a", "bb"], ["AC-GU", "A.CGU"])
+    save(tmp_path / "alignment.npz", alignment)
+    loaded = load(tmp_path / "alignment.npz", memory_map=memory_map)
+    assert isinstance(loaded, Alignment)
+    assert list(loaded.names) == ["a", "bb"]
+    np.testing.assert_array_equal(loaded.data, alignment.data)
+    assert not loaded.data.flags.writeable
+
+
+def test_family_round_trip(tmp_path, family):
+    save(tmp_path / "family.npz", family)
+    loaded = load(tmp_path / "family.npz")
+    assert loaded.accession == family.accession == "RF02913"
+    assert loaded.ss_cons == family.ss_cons
+    assert loaded.gs == family.gs and loaded.gr == family.gr
+    assert loaded.sequences == family.sequences
+    np.testing.assert_array_equal(loaded.alignment.data, family.alignment.data)
+
+
+def test_family_reload_faster_than_parsing(tmp_path, family):
+    save(tmp_path / "family.npz", family)
+
+    def best(function, repeat=5):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    parse = best(lambda: next(StockholmParser()(DATA)).alignment)
+    reload = best(lambda: load(tmp_path / "family.npz").alignment)
+    assert reload < parse
+
+
+@pytest.mark.parametrize("max_span", [None, 6])
+def test_fold_round_trip(tmp_path, max_span):
+    scoring = ScoringModel({"GU": 2, "AU": 0}, min_loop=1)
+    fold = RNAStruct("GGGAAAUCCCAGUUCAGGC", max_span=max_span, scoring=scoring)
+    save(tmp_path / "fold.npz", fold)
+    loaded = load(tmp_path / "fold.npz")
+    assert loaded.sequence == fold.sequence
+    assert loaded.max_span == fold.max_span
+    assert loaded.scoring.key == fold.scoring.key
+    assert loaded.max_n_pairs == fold.max_n_pairs
+    assert not loaded._filled
+    assert loaded._RNAStruct__scores is None
+    assert loaded._RNAStruct__matrix is None
+    assert loaded.to_parentheses() == fold.to_parentheses()
+
+
+def test_tree_round_trip(tmp_path):
+    tree = Tree.from_parentheses_and_sequence("((-(--))-())", "GACAUCGUCAUG")
+    save(tmp_path / "tree.npz", tree)
+    loaded = load(tmp_path / "tree.npz")
+    assert isinstance(loaded, Tree)
+    expected, actual = ArrayTree.from_tree(tree), ArrayTree.from_tree(loaded)
+    for name in ("parent", "kind", "bases"):
+        np.testing.assert_array_equal(getattr(actual, name), getattr(expected, name))
+    assert list(expected.kind) == [0, 2, 2, 1, 2, 1, 1, 1, 2]
+
+    save(tmp_path / "array.npz", expected)
+    loaded = load(tmp_path / "array.npz")
+    assert isinstance(loaded, ArrayTree)
+    assert loaded.to_parentheses() == "((-(--))-())"
+
+
+def test_save_rejects_unknown_objects(tmp_path):
+    with pytest.raises(TypeError):
+        save(tmp_path / "x.npz", "ACGU")
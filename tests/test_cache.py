@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from arnstruct.core.cache import FoldCache
+from arnstruct.core.dynamicprog import RNAStruct
+from arnstruct.core.scoring import ScoringModel
+
+
+def test_cached_folds_are_not_refolded():
+    cache = FoldCache()
+    first = RNAStruct("GGGAAACCCAGCU", cache=cache)
+    assert first.max_n_pairs == RNAStruct("GGGAAACCCAGCU").max_n_pairs
+    assert cache.stats == {"hits": 0, "disk_hits": 0, "misses": 1}
+
+    second = RNAStruct("gggaaacccagcu", cache=cache)
+    assert second.to_parentheses() == first.to_parentheses()
+    assert second.max_n_pairs == first.max_n_pairs
+    assert cache.stats["hits"] == 1
+    assert not second._filled
+    # nothing of size n * max_span is allocated on a hit
+    assert second._RNAStruct__scores is None and second._RNAStruct__matrix is None
+
+
+def test_keys_depend_on_the_folding_parameters():
+    sequence = "GGGAAAUCCC"
+    wobble = ScoringModel(wobble=True)
+    keys = {
+        FoldCache.key(sequence, 9, ScoringModel()),
+        FoldCache.key(sequence, 5, ScoringModel()),
+        FoldCache.key(sequence, 9, wobble),
+        FoldCache.key(sequence[:-1], 9, ScoringModel()),
+    }
+    assert len(keys) == 4
+    assert FoldCache.key(sequence, 9, wobble) == FoldCache.key(
+        sequence, 9, ScoringModel({"GU": 1, "UG": 1})
+    )
+
+
+def test_memory_tier_is_lru():
+    cache = FoldCache(maxsize=2)
+    pairs = np.array([-1])
+    cache.put("a", 0, pairs)
+    cache.put("b", 0, pairs)
+    assert cache.get("a") is not None
+    cache.put("c", 0, pairs)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_disk_tier(tmp_path):
+    sequence = "GCGCAAAAGCGCUUAGC"
+    scoring = ScoringModel({"GC": 1.5, "CG": 1.5}, wobble=True, min_loop=2)
+    expected = RNAStruct(sequence, scoring=scoring)
+    RNAStruct(
+        sequence, scoring=scoring, cache=FoldCache(directory=tmp_path)
+    ).max_n_pairs
+
+    cache = FoldCache(maxsize=0, directory=tmp_path)
+    fold = RNAStruct(sequence, scoring=scoring, cache=cache)
+    assert fold.max_n_pairs == pytest.approx(expected.max_n_pairs)
+    assert fold.pair_table().tolist() == expected.pair_table().tolist()
+    assert cache.stats == {"hits": 0, "disk_hits": 1, "misses": 0}
+
+    cache.clear(disk=True)
+    assert not list(tmp_path.iterdir())
+
+
+def test_invalid_cache():
+    with pytest.raises(TypeError):
+        RNAStruct("ACGU", cache={})
+    with pytest.raises(ValueError):
+        FoldCache(maxsize=-1)
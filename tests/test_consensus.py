@@ -0,0 +1,81 @@
+import itertools
+import pathlib
+
+import numpy as np
+import pytest
+
+from arnstruct.core.alignment import Alignment
+from arnstruct.core.consensus import ConsensusFold
+from arnstruct.core.dynamicprog import RNAStruct
+from arnstruct.core.scoring import ScoringModel
+from arnstruct.parsing.parseRfam import StockholmParser
+
+DATA = pathlib.Path(__file__).parent.parent / "data" / "RF02913.stockholm.txt"
+
+
+def naive_column_score(rows, i, j, scoring, covariation, penalty):
+    weights = scoring.weights
+    pairs = [row[i] + row[j] for row in rows]
+    allowed = [pair for pair in pairs if pair in weights]
+    total = sum(weights[pair] for pair in allowed)
+    differences = sum(
+        (p[0] != q[0]) + (p[1] != q[1]) for p, q in itertools.product(allowed, allowed)
+    )
+    return (
+        total
+        + covariation * differences / (2 * len(rows))
+        - penalty * (len(rows) - len(allowed))
+    )
+
+
+@pytest.mark.parametrize(
+    "scoring", [ScoringModel(), ScoringModel({"GC": 3, "CG": 3}, wobble=True)]
+)
+def test_pair_scores_match_naive(scoring):
+    rng = np.random.default_rng(0)
+    rows = ["".join(rng.choice(list("ACGU-"), 12)) for _ in range(15)]
+    alignment = Alignment.from_rows(map(str, range(15)), rows)
+    fold = ConsensusFold(alignment, scoring=scoring, covariation=0.5, penalty=0.25)
+    for i in range(12):
+        for j in range(i + 1, 12):
+            expected = naive_column_score(rows, i, j, scoring, 0.5, 0.25)
+            assert fold._delta(i, j) == pytest.approx(max(expected, 0))
+    np.testing.assert_array_equal(
+        np.asarray(fold._dynamic_prog()), fold._scalar_dynamic_prog()
+    )
+
+
+def test_single_sequence_matches_rnastruct():
+    sequence = "GGGAAAUCCCAGCUAGCUAAGC"
+    alignment = Alignment.from_rows(["s"], [sequence])
+    fold = ConsensusFold(alignment, covariation=0, penalty=0)
+    assert fold.sequence == sequence
+    assert fold.max_n_pairs == RNAStruct(sequence).max_n_pairs
+
+
+def test_covariation_is_rewarded():
+    rows = ["GAAAAC", "CAAAAG", "AAAAAU", "UAAAAA"]
+    alignment = Alignment.from_rows(map(str, range(4)), rows)
+    plain = ConsensusFold(alignment, covariation=0)
+    covarying = ConsensusFold(alignment, covariation=1)
+    assert covarying._delta(0, 5) == pytest.approx(plain._delta(0, 5) + 0.75 * 4)
+    assert covarying.to_parentheses() == "(----)"
+
+
+@pytest.mark.parametrize("backend", ["dense", "sparse"])
+def test_consensus_fold_of_rfam_family(backend):
+    (family,) = StockholmParser()(DATA)
+    fold = ConsensusFold(family.alignment, max_span=80, backend=backend)
+    structure = fold.to_parentheses()
+    assert len(structure) == family.alignment.n_columns
+    assert fold.max_n_pairs > 0
+
+
+def test_invalid_arguments():
+    alignment = Alignment.from_rows(["s"], ["GGGAAACCC"])
+    with pytest.raises(TypeError):
+        ConsensusFold("GGGAAACCC")
+    with pytest.raises(ValueError):
+        ConsensusFold(alignment, backend="four_russians")
+    with pytest.raises(NotImplementedError):
+        ConsensusFold(alignment).mutate(0, "A")
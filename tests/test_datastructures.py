@@ -0,0 +1,265 @@
+import random
+
+import numpy as np
+import pytest
+
+from arnstruct.core.datastructures import ArrayTree, Node, NodeView, Queue, Tree
+
+
+def random_structure(n, rng):
+    chars, depth = [], 0
+    for _ in range(n):
+        char = rng.choice("(-)" if depth else "(-")
+        depth += {"(": 1, "-": 0, ")": -1}[char]
+        chars.append(char)
+    structure = "".join(chars) + ")" * depth
+    return structure, "".join(rng.choice("ACGU") for _ in structure)
+
+
+def test_array_tree_round_trip():
+    rng = random.Random(0)
+    for _ in range(200):
+        structure, sequence = random_structure(rng.randint(0, 40), rng)
+        tree = ArrayTree.from_parentheses_and_sequence(structure, sequence)
+        assert tree.to_parentheses() == structure
+        assert tree.to_sequence() == sequence
+        assert tree.size == 1 + len(structure.replace(")", ""))
+
+        nodes = Tree.from_parentheses_and_sequence(structure, sequence)
+        converted = ArrayTree.from_tree(nodes)
+        for name in ("parent", "kind", "bases"):
+            np.testing.assert_array_equal(getattr(converted, name), getattr(tree, name))
+        assert ArrayTree.from_tree(tree.to_tree()) == tree
+
+
+def test_node_views():
+    tree = ArrayTree.from_parentheses_and_sequence("((-(--))-)", "GACAUCGUCA")
+    root = tree.root
+    assert root.content is None and root.degree == 1 and len(root) == tree.size == 8
+    (pair,) = root.children
+    assert pair.content_isinstance(Queue) and list(pair.content) == ["G", "A"]
+    assert [child.index for child in pair.children] == [2, 7]
+    assert pair.first_child.siblings == [NodeView(tree, 7)]
+    assert pair.children[1].content == "C" and pair.children[1].is_leaf()
+    assert pair.first_child.parent == pair and len(pair.first_child) == 5
+
+
+@pytest.mark.parametrize("structure", ["(()", "())", "(-.)"])
+def test_array_tree_invalid_expressions(structure):
+    with pytest.raises(ValueError):
+        ArrayTree.from_parentheses_and_sequence(structure, "A" * len(structure))
+
+
+def test_array_tree_requires_preorder():
+    bases = np.zeros((4, 2), dtype=np.uint8)
+    with pytest.raises(ValueError):
+        ArrayTree([-1, 0, 1, 1], [0, 2, 1, 1], bases[:3])
+    with pytest.raises(ValueError):
+        ArrayTree([-1, 0, 0, 1], [0, 2, 2, 1], bases)
+
+
+def test_tree_rendering():
+    rng = random.Random(1)
+    for _ in range(100):
+        structure, sequence = random_structure(rng.randint(0, 40), rng)
+        tree = Tree.from_parentheses_and_sequence(structure, sequence)
+        assert tree.to_parentheses() == structure
+        assert tree.to_sequence() == sequence
+
+    # pairs enclosing nothing, and nesting deeper than the recursion limit
+    tree = Tree.from_parentheses_and_sequence("(-())()", "ACGUAGC")
+    assert tree.to_parentheses() == "(-())()" and tree.to_sequence() == "ACGUAGC"
+    deep = Tree.from_parentheses_and_sequence("(" * 5000 + ")" * 5000, "GC" * 5000)
+    assert deep.to_parentheses() == "(" * 5000 + ")" * 5000
+
+
+def test_tree_rendering_cache():
+    tree = Tree.from_parentheses_and_sequence("((-)-)", "GCAGUC")
+    assert tree.to_sequence() == "GCAGUC"
+    assert tree.root._cache["render"] == ("GCAGUC", "((-)-)")
+
+    inner = tree.root.first_child.first_child
+    inner.add_child(Node("U"))
+    assert "render" not in tree.root._cache
+    assert tree.to_parentheses() == "((--)-)" and tree.to_sequence() == "GCAUGUC"
+    inner.first_child.add_sibling(Node("A"))
+    assert tree.to_sequence() == "GCAUAGUC"
+
+    inner.content.enqueue("A")
+    assert tree.to_sequence() == "GCAUAAUC"
+    inner.content.dequeue()
+    assert tree.to_sequence() == "GGAUAAUC"
+
+
+def test_caches_of_trees_sharing_a_node():
+    tree = Tree.from_parentheses_and_sequence("(-)(--)", "GAUCAAG")
+    assert (tree.to_sequence(), len(tree)) == ("GAUCAAG", 6)
+    shared = tree.root.children[1]
+    other = Tree(Node())
+    other.root.add_child(shared)
+    assert (other.to_sequence(), len(other)) == ("CAAG", 4)
+
+    shared.first_child.add_child(Node("U"))
+    assert (tree.to_sequence(), len(tree), tree.height) == ("GAUCAUAG", 7, 3)
+    assert (other.to_sequence(), len(other), other.height) == ("CAUAG", 5, 3)
+
+
+def describe(node):
+    content = node.content
+    return list(content) if isinstance(content, Queue) else content
+
+
+def test_traversals():
+    structure, sequence = "((-(--))-)-", "GACAUCGUCAU"
+    trees = [
+        Tree.from_parentheses_and_sequence(structure, sequence),
+        ArrayTree.from_parentheses_and_sequence(structure, sequence),
+    ]
+    for tree in trees:
+        assert [describe(node) for node in tree.preorder()][:4] == [
+            None,
+            ["G", "A"],
+            ["A", "U"],
+            "C",
+        ]
+        postorder = [describe(node) for node in tree.postorder()]
+        assert postorder == [
+            "C",
+            "U",
+            "C",
+            ["A", "G"],
+            ["A", "U"],
+            "C",
+            ["G", "A"],
+            "U",
+            None,
+        ]
+        levels = [(depth, describe(node)) for depth, node in tree.level_order()]
+        assert levels[:3] == [(0, None), (1, ["G", "A"]), (1, "U")]
+        assert [depth for depth, _ in levels] == [0, 1, 1, 2, 2, 3, 3, 4, 4]
+        assert [describe(node) for node in tree.leaves()] == ["C", "U", "C", "C", "U"]
+        first = next(iter(tree.root.children))
+        assert [describe(node) for node in first.leaves()] == ["C", "U", "C", "C"]
+        assert tree.size == len(tree) == 9
+
+
+def test_tree_equality_and_size_on_deep_trees():
+    a = Tree.from_parentheses_and_sequence("((-)-)", "GCAGUC")
+    b = Tree.from_parentheses_and_sequence("((-)-)", "AUCCGU")
+    c = Tree.from_parentheses_and_sequence("(-(-))", "GCAGUC")
+    assert a == b and not a == c and a.equals(ArrayTree.from_tree(b).to_tree())
+    assert ArrayTree.from_tree(a) == b and not ArrayTree.from_tree(a) == c
+
+    deep = Tree.from_parentheses_and_sequence("(" * 5000 + ")" * 5000, "GC" * 5000)
+    assert deep.size == 5001 and deep == deep
+
+
+def test_cached_sizes_and_heights():
+    tree = Tree.from_parentheses_and_sequence("((-)-)", "GCAGUC")
+    inner = tree.root.first_child.first_child
+    assert (tree.size, tree.height, len(inner), inner.height) == (5, 3, 2, 1)
+    assert tree.root._cache == {"size": 5, "height": 3}
+
+    leaf = Node("U")
+    inner.first_child.add_sibling(leaf)
+    assert leaf._cache == {"size": 1, "height": 0}
+    assert tree.size == 6 and inner.degree == 2 and tree.height == 3
+    grown = Tree.from_parentheses_and_sequence("(-(-))", "GAGCUC").root
+    leaf.add_child(grown)
+    assert tree.size == 11 and tree.height == 7 and len(inner) == 8
+    assert (tree.size, tree.height) == (len(tree.root), tree.root.height)
+    fresh = Tree(tree.root)
+    for node in fresh.preorder():
+        node._cache.clear()
+    assert (fresh.size, fresh.height, len(inner)) == (11, 7, 8)
+
+    array = ArrayTree.from_tree(tree)
+    assert array.height == 7 and array.root.first_child.height == 6
+
+
+def test_cached_sizes_with_siblings_attached_before_the_parent():
+    root, first = Node(), Node("A")
+    first.add_siblings(Node("B"), Node("C"))
+    assert len(root) == 1
+    root.add_child(first)
+    assert len(root) == 4 and root.height == 1
+
+    tree = Tree(root)
+    root.children[1].add_child(Node("x"))
+    assert len(tree) == 5 and tree.height == 2
+    # only the siblings of a first child are children of its parent
+    root.children[2].add_sibling(Node("D"))
+    assert len(tree) == 5 and root.degree == 3
+
+
+def naive_common_subtree(a, b):
+    """Recursive definition of the score : 1 + the best order-preserving
+    matching of the children, trying every choice."""
+    if a.kind[0] != b.kind[0]:
+        return 0
+
+    def score(u, v):
+        if a.kind[u] != b.kind[v]:
+            return 0
+        return 1 + best(children(a, u), children(b, v))
+
+    def best(xs, ys):
+        if not xs or not ys:
+            return 0
+        return max(
+            best(xs[1:], ys),
+            best(xs, ys[1:]),
+            score(xs[0], ys[0]) + best(xs[1:], ys[1:]) if score(xs[0], ys[0]) else 0,
+        )
+
+    return score(0, 0)
+
+
+def children(tree, index):
+    return [view.index for view in NodeView(tree, index).children or []]
+
+
+def test_maximum_common_subtree():
+    rng = random.Random(2)
+    for _ in range(60):
+        a = ArrayTree.from_parentheses_and_sequence(*random_structure(12, rng))
+        b = ArrayTree.from_parentheses_and_sequence(*random_structure(12, rng))
+        mapping = a.maximum_common_subtree(b)
+        assert len(mapping) == naive_common_subtree(a, b)
+
+        images = dict(mapping)
+        assert mapping[0] == (0, 0) and len(set(images.values())) == len(mapping)
+        for u, v in mapping[1:]:
+            assert images[a.parent[u]] == b.parent[v] and a.kind[u] == b.kind[v]
+        for u, v in mapping:
+            mapped = [images[c] for c in children(a, u) if c in images]
+            assert mapped == sorted(mapped)
+
+    structure, sequence = random_structure(300, rng)
+    tree = Tree.from_parentheses_and_sequence(structure, sequence)
+    assert tree.maximum_common_subtree(tree) == [(k, k) for k in range(tree.size)]
+
+
+@pytest.mark.parametrize("compare_bases", [False, True])
+def test_maximum_common_subtree_vectorized(compare_bases):
+    rng = random.Random(3)
+    for _ in range(20):
+        a = ArrayTree.from_parentheses_and_sequence(*random_structure(40, rng))
+        b = ArrayTree.from_parentheses_and_sequence(*random_structure(40, rng))
+        expected = a.maximum_common_subtree(b, compare_bases)
+        a._vector_cells = 0
+        assert a.maximum_common_subtree(b, compare_bases) == expected
+
+    flat = ArrayTree.from_parentheses_and_sequence("-" * 2000, "AC" * 1000)
+    mapping = flat.maximum_common_subtree(flat, compare_bases)
+    assert mapping == [(k, k) for k in range(flat.size)]
+
+
+def test_maximum_common_subtree_bases():
+    a = Tree.from_parentheses_and_sequence("(--)-", "GAAUC")
+    b = Tree.from_parentheses_and_sequence("(-)--", "GCCUA")
+    mapping = a.maximum_common_subtree(b)
+    assert len(mapping) == 4 and mapping[:2] == [(0, 0), (1, 1)]
+    assert a.maximum_common_subtree(b, compare_bases=True) == [(0, 0)]
+    with pytest.raises(TypeError):
+        a.maximum_common_subtree("(--)-")
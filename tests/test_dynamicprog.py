@@ -0,0 +1,283 @@
+import random
+
+import numpy as np
+import pytest
+
+from arnstruct.core.cache import FoldCache
+from arnstruct.core.dynamicprog import RNAStruct
+from arnstruct.core.scoring import ScoringModel
+
+
+def random_rna(length: int, seed: int) -> str:
+    rng = random.Random(seed)
+    return "".join(rng.choice("AUCG") for _ in range(length))
+
+
+@pytest.mark.parametrize("length", [1, 2, 3, 8, 25, 60])
+def test_vectorized_fill_matches_scalar(length):
+    for seed in range(5):
+        fold = RNAStruct(random_rna(length, seed))
+        expected = fold._scalar_dynamic_prog()
+        np.testing.assert_array_equal(fold._dynamic_prog(), expected)
+        assert fold.max_n_pairs == expected.max()
+
+
+def test_bifurcation_blocks_match_unblocked():
+    sequence = random_rna(80, 42)
+    reference = RNAStruct(sequence)
+    blocked = RNAStruct(sequence)
+    blocked._block_cells = 7
+    np.testing.assert_array_equal(blocked._dynamic_prog(), reference._dynamic_prog())
+
+
+def test_known_max_n_pairs():
+    assert RNAStruct("CCGGCAUG").max_n_pairs == 4
+    assert RNAStruct("AAAA").max_n_pairs == 0
+
+
+@pytest.mark.parametrize("length", [0, 1, 2, 9, 40, 120])
+def test_traceback_is_optimal_and_consistent(length):
+    for seed in range(5):
+        sequence = random_rna(length, seed)
+        fold = RNAStruct(sequence)
+        pairs = fold.pair_table()
+        paired = np.flatnonzero(pairs >= 0)
+        np.testing.assert_array_equal(pairs[pairs[paired]], paired)
+        for i in paired[pairs[paired] > paired]:
+            assert fold._delta(i, pairs[i])
+        if length:
+            assert len(paired) // 2 == fold.max_n_pairs
+
+        parentheses = fold.to_parentheses()
+        assert len(parentheses) == length
+        assert parentheses.count("(") == len(paired) // 2
+        assert len(fold.to_tree()) == 1 + length - len(paired) // 2
+
+
+def test_matrix_uses_narrow_dtype():
+    assert RNAStruct(random_rna(200, 0))._matrix.dtype == np.int8
+    assert RNAStruct(random_rna(300, 0))._matrix.dtype == np.int16
+
+
+def test_scores_are_widened_from_the_matrix_dtype():
+    folds = [RNAStruct(random_rna(120, seed)) for seed in range(6)]
+    assert folds[0]._matrix.dtype == np.int8
+    scores = [fold.max_n_pairs for fold in folds]
+    assert sum(scores) == sum(int(score) for score in scores) > 127
+    assert folds[0].max_n_pairs * 3 == 3 * int(folds[0].max_n_pairs)
+    assert folds[0].mutation_scan().dtype == np.int64
+
+    cache = FoldCache()
+    RNAStruct(random_rna(120, 0), cache=cache).max_n_pairs
+    assert RNAStruct(random_rna(120, 0), cache=cache).max_n_pairs.dtype == np.int64
+
+
+def span_limited_reference(sequence: str, max_span: int) -> int:
+    """Nussinov recurrence where (i, j) may only pair if j - i <= max_span."""
+    n = len(sequence)
+    fold = RNAStruct(sequence)
+    matrix = np.zeros((n + 1, n + 1), dtype=int)
+    for k in range(1, n):
+        for i in range(n - k):
+            j = i + k
+            pair = fold._delta(i, j) if k <= max_span else 0
+            matrix[i, j] = max(
+                matrix[i + 1, j],
+                matrix[i, j - 1],
+                matrix[i + 1, j - 1] + pair,
+                max(
+                    (matrix[i, m] + matrix[m + 1, j] for m in range(i + 1, j)),
+                    default=0,
+                ),
+            )
+    return matrix[0, n - 1] if n else 0
+
+
+@pytest.mark.parametrize("max_span", [1, 3, 7, 20, 100])
+def test_banded_fold(max_span):
+    for seed in range(4):
+        sequence = random_rna(45, seed)
+        full = RNAStruct(sequence)
+        banded = RNAStruct(sequence, max_span=max_span)
+        span = min(max_span, len(sequence) - 1)
+        assert banded.max_span == span
+        assert banded._dynamic_prog().band.shape == (len(sequence), span + 1)
+        np.testing.assert_array_equal(
+            banded._dynamic_prog().band, full._dynamic_prog().band[:, : span + 1]
+        )
+        assert banded.max_n_pairs == span_limited_reference(sequence, max_span)
+
+        pairs = banded.pair_table()
+        paired = np.flatnonzero(pairs >= 0)
+        assert np.all(np.abs(pairs[paired] - paired) <= max_span)
+        assert len(paired) // 2 == banded.max_n_pairs
+
+
+def test_local_structures_without_max_span_decompose_the_optimum():
+    sequence = random_rna(120, 7)
+    fold = RNAStruct(sequence)
+    parentheses = fold.to_parentheses()
+    previous_end = -1
+    for start, end, local in fold.local_structures():
+        assert previous_end < start <= end < len(sequence)
+        assert local == parentheses[start : end + 1]
+        previous_end = end
+    assert "(" not in parentheses[previous_end + 1 :]
+
+
+@pytest.mark.parametrize("window", [None, 26, 60])
+def test_local_structures_scan_windows(window):
+    sequence = random_rna(300, 7)
+    fold = RNAStruct(sequence, max_span=25)
+    previous_end, n_pairs = -1, 0
+    for start, end, local in fold.local_structures(window):
+        assert previous_end < start <= end < len(sequence)
+        assert end - start <= 25 and len(local) == end - start + 1
+        # every substructure is an optimal fold of its own interval
+        best = RNAStruct(sequence[start : end + 1], max_span=25).max_n_pairs
+        assert local.count("(") == best
+        previous_end, n_pairs = end, n_pairs + best
+    assert n_pairs > 0
+    assert not fold._filled
+    with pytest.raises(ValueError):
+        next(fold.local_structures(25))
+
+
+def test_invalid_max_span():
+    with pytest.raises(ValueError):
+        RNAStruct("ACGU", max_span=0)
+
+
+@pytest.mark.parametrize(
+    "scoring",
+    [
+        ScoringModel(wobble=True),
+        ScoringModel(min_loop=3),
+        ScoringModel(weights={"GC": 3, "CG": 3, "AU": 2, "UA": 2}, wobble=True),
+        ScoringModel(weights={"GC": 1.5, "CG": 1.5}, min_loop=1),
+    ],
+)
+def test_scoring_models(scoring):
+    for seed in range(4):
+        fold = RNAStruct(random_rna(50, seed), scoring=scoring)
+        expected = fold._scalar_dynamic_prog()
+        np.testing.assert_array_equal(np.asarray(fold._dynamic_prog()), expected)
+
+        pairs = fold.pair_table()
+        opening = np.flatnonzero(pairs > np.arange(len(pairs)))
+        assert np.all(pairs[opening] - opening > scoring.min_loop)
+        table = scoring.pair_matrix(fold.sequence)
+        assert table[opening, pairs[opening]].sum() == pytest.approx(fold.max_n_pairs)
+        assert np.all(table[opening, pairs[opening]] > 0)
+
+
+@pytest.mark.parametrize("max_span", [None, 10])
+@pytest.mark.parametrize(
+    "scoring",
+    [None, ScoringModel(wobble=True, min_loop=3), ScoringModel(weights={"GC": 3})],
+)
+def test_sparse_backend_matches_dense(scoring, max_span):
+    for seed in range(4):
+        sequence = random_rna(70, seed)
+        dense = RNAStruct(sequence, max_span=max_span, scoring=scoring)
+        sparse = RNAStruct(sequence, max_span, scoring, backend="sparse")
+        np.testing.assert_array_equal(
+            sparse._dynamic_prog().band, dense._dynamic_prog().band
+        )
+        assert sparse.max_n_pairs == dense.max_n_pairs
+        assert sparse.to_parentheses() == dense.to_parentheses()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        RNAStruct("ACGU", backend="quantum")
+
+
+@pytest.mark.parametrize("block", [None, 2, 3, 5])
+@pytest.mark.parametrize("max_span", [None, 12])
+@pytest.mark.parametrize("scoring", [None, ScoringModel(wobble=True, min_loop=3)])
+def test_four_russians_backend_matches_dense(block, max_span, scoring):
+    for length, seed in [(1, 0), (2, 0), (17, 1), (64, 2), (131, 3)]:
+        sequence = random_rna(length, seed)
+        dense = RNAStruct(sequence, max_span, scoring)
+        russians = RNAStruct(sequence, max_span, scoring, backend="four_russians")
+        russians._russians_block = block
+        np.testing.assert_array_equal(
+            russians._dynamic_prog().band, dense._dynamic_prog().band
+        )
+        assert russians.max_n_pairs == dense.max_n_pairs
+        assert russians.pair_table().tolist() == dense.pair_table().tolist()
+
+
+def test_four_russians_lookup_table():
+    table = RNAStruct._russians_table(3)
+    # row bits 0b11 : prefix 0, 1, 2 ; column bits 0b01 : suffix 1, 0, 0
+    assert table[0b11, 0b01] == 2
+    assert table[0b00, 0b11] == 2
+    assert table[0b01, 0b10] == 2
+    assert table[0b00, 0b00] == 0
+
+
+def test_four_russians_requires_unit_scores():
+    with pytest.raises(ValueError):
+        RNAStruct("GGGAAACCC", scoring=ScoringModel({"GC": 2}), backend="four_russians")
+
+
+def substitute(sequence: str, position: int, base: str) -> str:
+    return sequence[:position] + base + sequence[position + 1 :]
+
+
+@pytest.mark.parametrize("max_span", [None, 6])
+@pytest.mark.parametrize(
+    "scoring",
+    [
+        None,
+        ScoringModel(wobble=True, min_loop=3),
+        ScoringModel({"GC": 3, "CG": 3, "AU": 2, "UA": 2}, min_loop=1),
+    ],
+)
+def test_mutate_matches_fresh_fold(max_span, scoring):
+    sequence = random_rna(40, 7)
+    fold = RNAStruct(sequence, max_span, scoring)
+    for position, base in [(0, "G"), (13, "C"), (39, "A"), (20, sequence[20])]:
+        mutant = fold.mutate(position, base)
+        fresh = RNAStruct(substitute(sequence, position, base), max_span, scoring)
+        assert mutant.sequence == fresh.sequence
+        np.testing.assert_array_equal(
+            mutant._dynamic_prog().band, fresh._dynamic_prog().band
+        )
+        assert mutant.to_parentheses() == fresh.to_parentheses()
+    # the original fold is left untouched
+    assert fold.sequence == sequence
+
+
+def test_mutate_invalid_arguments():
+    fold = RNAStruct("GGGAAACCC")
+    with pytest.raises(IndexError):
+        fold.mutate(9, "A")
+    with pytest.raises(ValueError):
+        fold.mutate(0, "AU")
+
+
+@pytest.mark.parametrize("max_span", [None, 4, 9])
+@pytest.mark.parametrize(
+    "scoring",
+    [
+        None,
+        ScoringModel(wobble=True, min_loop=3),
+        ScoringModel({"GC": 1.5, "CG": 1.5, "AU": 1, "UA": 1}, min_loop=1),
+    ],
+)
+def test_mutation_scan_matches_independent_folds(max_span, scoring):
+    for length, seed in [(1, 0), (2, 1), (11, 2), (27, 3)]:
+        sequence = random_rna(length, seed)
+        fold = RNAStruct(sequence, max_span, scoring)
+        scan = fold.mutation_scan()
+        assert scan.shape == (length, 4)
+        for position in range(length):
+            for b, base in enumerate(ScoringModel.alphabet):
+                mutant = substitute(sequence, position, base)
+                expected = RNAStruct(mutant, max_span, scoring).max_n_pairs
+                assert scan[position, b] == expected
+            wild_type = ScoringModel.alphabet.index(sequence[position])
+            assert scan[position, wild_type] == fold.max_n_pairs
@@ -0,0 +1,71 @@
+import bz2
+import gzip
+import lzma
+import pathlib
+
+import pytest
+
+from arnstruct.parsing.compression import compression_of, open_text
+from arnstruct.parsing.parseFasta import FastaParser
+from arnstruct.parsing.parseRfam import StockholmParser
+
+DATA = pathlib.Path(__file__).parent.parent / "data" / "RF02913.stockholm.txt"
+
+COMPRESSORS = {"gzip": gzip.compress, "bz2": bz2.compress, "xz": lzma.compress}
+
+FASTA = """\
+>seq1 first record
+ACGU
+acgu
+; a comment
+>seq2
+GGGAAACCC
+
+>seq3
+AUGN
+"""
+
+
+@pytest.mark.parametrize("compression", [None, "gzip", "bz2", "xz"])
+def test_compressed_stockholm(tmp_path, compression):
+    raw = DATA.read_bytes()
+    path = tmp_path / "RF02913.sto.any"
+    path.write_bytes(COMPRESSORS[compression](raw) if compression else raw)
+    assert compression_of(path) == compression
+    with open_text(path) as f:
+        assert f.readline() == "# STOCKHOLM 1.0\n"
+
+    parser = StockholmParser()
+    (family,) = parser(path)
+    assert family.accession == "RF02913" and len(family) == 1542
+    (family,) = parser.parse_parallel(path, workers=1)
+    assert len(family) == 1542
+    if compression:
+        with pytest.raises(ValueError):
+            parser.index(path)
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_fasta_chunks(tmp_path, compression):
+    path = tmp_path / "records.fa"
+    raw = FASTA.encode()
+    path.write_bytes(COMPRESSORS[compression](raw) if compression else raw)
+
+    with pytest.raises(ValueError):
+        list(FastaParser()(path))
+    chunks = list(FastaParser(chunk_size=1, skip_invalid=True)(path))
+    assert [[name for name, _ in chunk] for chunk in chunks] == [
+        ["seq1 first record"],
+        ["seq2"],
+    ]
+    assert chunks[0][0][1].sequence == "ACGUACGU"
+
+
+def test_fasta_options():
+    lines = [">dna", "ACGT", ">rna", "ACGU"]
+    (chunk,) = FastaParser(dna=True).parse_lines(lines)
+    assert [sequence.sequence for _, sequence in chunk] == ["ACGU", "ACGU"]
+    with pytest.raises(ValueError):
+        list(FastaParser.records(["ACGU"]))
+    with pytest.raises(ValueError):
+        FastaParser(chunk_size=0)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from arnstruct.core.scoring import ScoringModel
+
+
+def test_encode():
+    np.testing.assert_array_equal(
+        ScoringModel.encode("ACGUacgu-."), [0, 1, 2, 3] * 2 + [4, 4]
+    )
+
+
+def test_default_model_scores_watson_crick_pairs():
+    scores = ScoringModel().pair_matrix("GACU")
+    expected = np.zeros((4, 4))
+    expected[0, 2] = expected[1, 3] = 1
+    np.testing.assert_array_equal(scores, expected)
+
+
+def test_wobble_weights_and_min_loop():
+    model = ScoringModel(weights={"GC": 3, "CG": 3}, wobble=True, min_loop=3)
+    assert model.weights == {"AU": 1, "UA": 1, "CG": 3, "GC": 3, "GU": 1, "UG": 1}
+    scores = model.pair_matrix("GAAAAUCGAC")
+    assert scores[0, 5] == 1 and scores[0, 6] == 3 and scores[6, 9] == 0
+    assert np.all(np.triu(scores, 0)[np.tril_indices(10, 3)] == 0)
+    assert ScoringModel(weights={"AU": 0, "UA": 0}).max_weight == 1
+    assert ScoringModel(weights={"GC": 2.5}).score_dtype(10) == np.float64
+
+
+def test_weight_keys_are_case_insensitive():
+    assert "AU" not in ScoringModel({"au": 0}).weights
+    assert ScoringModel({"au": 5}).weights["AU"] == 5
+    assert ScoringModel({"gu": 2}, wobble=True).weights["GU"] == 2
+    assert ScoringModel({"ua": 0}).pair_matrix("UA")[0, 1] == 0
+
+
+@pytest.mark.parametrize("max_span", [None, 1, 4, 30])
+def test_pair_scores_match_pair_matrix(max_span):
+    model = ScoringModel(weights={"GC": 2, "CG": 2}, wobble=True, min_loop=2)
+    sequence = "GGCAUCGAUGCCAGUUGACGUAGC"
+    dense = model.pair_matrix(sequence)
+    if max_span is not None:
+        dense = np.tril(dense, max_span)
+    np.testing.assert_array_equal(
+        np.asarray(model.pair_scores(sequence, max_span)), dense
+    )
+
+
+def test_invalid_models():
+    with pytest.raises(ValueError):
+        ScoringModel(weights={"AX": 1})
+    with pytest.raises(ValueError):
+        ScoringModel(weights={"AU": -1})
+    with pytest.raises(ValueError):
+        ScoringModel(min_loop=-1)
+    assert ScoringModel(wobble=True) == ScoringModel(weights={"GU": 1, "UG": 1})
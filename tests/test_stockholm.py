@@ -0,0 +1,166 @@
+import pathlib
+
+import pytest
+
+from arnstruct.parsing.parseRfam import StockholmParser
+
+DATA = pathlib.Path(__file__).parent.parent / "data" / "RF02913.stockholm.txt"
+
+TWO_RECORDS = """\
+# STOCKHOLM 1.0
+#=GF AC   RF00001
+#=GF ID   first
+#=GF AU   Someone A
+#=GF AU   Someone B
+#=GS seq1/1-6 DE a description
+
+seq1/1-6   GG-A
+seq2/1-5   G--A
+#=GR seq1/1-6 SS <<..
+#=GC SS_cons  <<..
+
+seq1/1-6   CC
+seq2/1-5   CU
+#=GR seq1/1-6 SS >>
+#=GC SS_cons  >>
+//
+# STOCKHOLM 1.0
+#=GF AC   RF00002
+seq3   ACGU
+//
+"""
+
+
+def test_parse_multiple_interleaved_records():
+    first, second = StockholmParser().parse_lines(TWO_RECORDS.splitlines())
+    assert first.accession == "RF00001" and first.identifier == "first"
+    assert first.gf["AU"] == ["Someone A", "Someone B"]
+    assert first.gs == {"seq1/1-6": {"DE": ["a description"]}}
+    assert first.sequences == {"seq1/1-6": "GG-ACC", "seq2/1-5": "G--ACU"}
+    assert first.ss_cons == "<<..>>"
+    assert first.gr == {"seq1/1-6": {"SS": "<<..>>"}}
+    assert second.accession == "RF00002" and second.identifier is None
+    assert list(second) == [("seq3", "ACGU")]
+
+
+def test_parser_is_lazy():
+    lines = iter(TWO_RECORDS.splitlines())
+    families = StockholmParser().parse_lines(lines)
+    assert next(families).accession == "RF00001"
+    # the second record has not been read yet
+    assert next(lines) == "# STOCKHOLM 1.0"
+
+
+def test_parse_rfam_file():
+    (family,) = StockholmParser()(DATA)
+    assert family.accession == "RF02913"
+    assert len(family) == int(family.gf["SQ"][0]) == 1542
+    assert set(family.gc) == {"SS_cons", "RF"}
+    assert {len(row) for _, row in family} == {len(family.ss_cons)}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "# STOCKHOLM 1.0\nseq ACGU\n",
+        "seq ACGU\n//\n",
+        "# STOCKHOLM 1.0\nseq AC GU\n//\n",
+        "# STOCKHOLM 1.0\n# STOCKHOLM 1.0\n//\n",
+    ],
+)
+def test_malformed_input(text):
+    with pytest.raises(ValueError):
+        list(StockholmParser().parse_lines(text.splitlines()))
+
+
+def test_invalid_filename_type():
+    with pytest.raises(TypeError):
+        StockholmParser()(42)
+
+
+def test_index_and_fetch(tmp_path):
+    path = tmp_path / "families.sto"
+    path.write_text(TWO_RECORDS + DATA.read_text())
+    parser = StockholmParser()
+
+    records = parser.index(path)
+    assert set(records) == {"RF00001", "first", "RF00002", "RF02913", "pemK"}
+    assert records["RF00001"] == records["first"]
+    assert parser.index_path(path).exists()
+
+    family = parser.fetch(path, "pemK")
+    assert family.accession == "RF02913" and len(family) == 1542
+    assert parser.fetch(path, "RF00002").sequences == {"seq3": "ACGU"}
+    with pytest.raises(KeyError):
+        parser.fetch(path, "RF99999")
+
+
+def test_index_is_rebuilt_when_the_file_changes(tmp_path):
+    path = tmp_path / "families.sto"
+    path.write_text(TWO_RECORDS)
+    parser = StockholmParser()
+    assert "RF00002" in parser.index(path)
+
+    path.write_text(TWO_RECORDS.replace("RF00002", "RF00003") + "\n")
+    records = parser.index(path)
+    assert "RF00003" in records and "RF00002" not in records
+    assert parser.fetch(path, "RF00003").sequences == {"seq3": "ACGU"}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_parsing_preserves_file_order(tmp_path, workers):
+    records = [
+        TWO_RECORDS.replace("RF00001", f"RF1{k:04d}").replace("RF00002", f"RF2{k:04d}")
+        for k in range(20)
+    ]
+    path = tmp_path / "families.sto"
+    path.write_text("".join(records))
+    parser = StockholmParser()
+
+    ranges = parser.split_ranges(path, 7)
+    assert 1 < len(ranges) <= 7
+    assert ranges[0][0] == 0 and ranges[-1][1] == path.stat().st_size
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+
+    expected = [family.accession for family in parser(path)]
+    families = list(parser.parse_parallel(path, workers=workers, ranges_per_worker=3))
+    assert [family.accession for family in families] == expected
+    assert families[-1].sequences == {"seq3": "ACGU"}
+
+    # arguments are checked when called, not on the first next()
+    with pytest.raises(TypeError):
+        parser.parse_parallel(42)
+    with pytest.raises(ValueError):
+        parser.parse_parallel(path, workers=-1)
+
+
+def test_field_selection():
+    parser = StockholmParser(fields=["GF:AC", "GC"])
+    first, second = parser.parse_lines(TWO_RECORDS.splitlines())
+    assert first.gf == {"AC": ["RF00001"]}
+    assert first.identifier is None
+    assert first.gs == {} and first.gr == {}
+    assert first.ss_cons == "<<..>>"
+    assert first.sequences == {"seq1/1-6": "GG-ACC", "seq2/1-5": "G--ACU"}
+    assert second.accession == "RF00002"
+
+    (family,) = StockholmParser(fields=["GR:SS", "GF:AU", "GF"]).parse_lines(
+        TWO_RECORDS.splitlines()[:17]
+    )
+    assert family.gr == {"seq1/1-6": {"SS": "<<..>>"}}
+    assert family.gf["AU"] == ["Someone A", "Someone B"] and family.accession
+    with pytest.raises(ValueError):
+        StockholmParser(fields=["sequences"])
+
+
+def test_lazy_annotations():
+    text = TWO_RECORDS.replace("#=GR seq1/1-6 SS >>", "#=GR seq1/1-6")
+    first, _ = StockholmParser(lazy=True).parse_lines(text.splitlines())
+    assert set(first._raw) == {"GF", "GS", "GC", "GR"}
+    assert first.ss_cons == "<<..>>"
+    assert "GC" not in first._raw and "GR" in first._raw
+    # malformed lines are only reported when their annotations are parsed
+    with pytest.raises(ValueError, match="line 15"):
+        first.gr
+    with pytest.raises(ValueError):
+        list(StockholmParser().parse_lines(text.splitlines()))
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from arnstruct.core.triangular import TriangularMatrix, smallest_int_dtype
+
+
+def test_smallest_int_dtype():
+    assert smallest_int_dtype(0) == np.int8
+    assert smallest_int_dtype(127) == np.int8
+    assert smallest_int_dtype(128) == np.int16
+    assert smallest_int_dtype(10_000) == np.int16
+    assert smallest_int_dtype(40_000) == np.int32
+
+
+def test_matrix_style_indexing_matches_dense():
+    n = 7
+    matrix = TriangularMatrix(n, dtype=np.int16)
+    dense = np.zeros((n, n), dtype=np.int16)
+    for i in range(n):
+        for j in range(i, n):
+            matrix[i, j] = dense[i, j] = 10 * i + j
+
+    np.testing.assert_array_equal(np.asarray(matrix), dense)
+    assert matrix[2, 5] == dense[2, 5]
+    assert matrix[5, 2] == 0
+    np.testing.assert_array_equal(matrix[1, 2:6], dense[1, 2:6])
+    np.testing.assert_array_equal(matrix[0:4, 4], dense[0:4, 4])
+    np.testing.assert_array_equal(matrix[1:3, 2:5], dense[1:3, 2:5])
+    np.testing.assert_array_equal(matrix.diagonal(3), np.diagonal(dense, 3))
+    assert matrix.max() == dense.max()
+
+    with pytest.raises(IndexError):
+        matrix[4, 1] = 3
+
+
+@pytest.mark.parametrize("cell", [(4, 6), (-1, 2), (5, 5)])
+def test_set_out_of_bounds(cell):
+    matrix = TriangularMatrix(5)
+    with pytest.raises(IndexError):
+        matrix[cell] = 7
+    assert not matrix.band.any()